@@ -0,0 +1,137 @@
+import time
+
+import cv2
+
+
+class SysfsReadings:
+    # SoC temperature and CPU load as Linux reports them. Anything that cannot
+    # be read (e.g. no thermal zone on a desktop) comes back as None.
+    def __init__(self, thermal_zone="/sys/class/thermal/thermal_zone0/temp", stat="/proc/stat"):
+        self.thermal_zone = thermal_zone
+        self.stat = stat
+        self.previous = None
+
+    def temperature(self):
+        try:
+            with open(self.thermal_zone) as f:
+                return int(f.read()) / 1000
+        except (OSError, ValueError):
+            return None
+
+    def cpu_load(self):
+        # Busy fraction of all cores since the previous call
+        try:
+            with open(self.stat) as f:
+                values = [int(value) for value in f.readline().split()[1:]]
+        except (OSError, ValueError):
+            return None
+        idle, total = values[3] + values[4], sum(values)
+        previous, self.previous = self.previous, (idle, total)
+        if previous is None or total == previous[1]:
+            return None
+        return 1 - (idle - previous[0]) / (total - previous[1])
+
+
+def build_levels(imgsz=640, capture=(640, 480), dynamic_size=True):
+    # Quality ladder from best to cheapest as (input size, frame skip, capture size).
+    # Exported ONNX/OpenVINO models have a fixed input size, so only PyTorch
+    # weights get the smaller sizes.
+    sizes = [imgsz]
+    if dynamic_size:
+        sizes += [size for size in (512, 416, 320) if size < imgsz]
+    levels = [(size, 1, capture) for size in sizes]
+    smallest = sizes[-1]
+    for size in ((480, 360), (320, 240)):
+        if size[0] < capture[0]:
+            levels.append((smallest, 1, size))
+    levels += [(smallest, skip, levels[-1][2]) for skip in (2, 3)]
+    return levels
+
+
+class QualityController:
+    # Steps along the quality ladder to hold target_fps. Every interval seconds
+    # it compares the frame rate the detector could sustain at the current level
+    # (frame skip / smoothed inference latency) with the target, and also backs
+    # off when the SoC is too hot or the CPU saturated. It only steps back up
+    # when the next level's rough cost still leaves headroom, so it does not
+    # oscillate. readings is anything with temperature() and cpu_load().
+    def __init__(self, target_fps, levels, readings=None, max_temp=75.0, max_cpu=0.9, interval=2.0):
+        self.target_fps = target_fps
+        self.levels = levels
+        self.readings = readings if readings is not None else SysfsReadings()
+        self.max_temp = max_temp
+        self.max_cpu = max_cpu
+        self.interval = interval
+        self.level = 0
+        self.latency = None
+        self.frames = 0
+        self.window_start = time.monotonic()
+        self.applied_capture = None
+        # Description of the last change, picked up by the GUI thread
+        self.pending = None
+
+    @property
+    def imgsz(self):
+        return self.levels[self.level][0]
+
+    @property
+    def frame_skip(self):
+        return self.levels[self.level][1]
+
+    @property
+    def capture_size(self):
+        return self.levels[self.level][2]
+
+    def record(self, latency=None):
+        # Called by the inference stage for every frame, with the forward pass time when the model ran
+        self.frames += 1
+        if latency is not None:
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        now = time.monotonic()
+        elapsed = now - self.window_start
+        if elapsed >= self.interval:
+            self._adjust(self.frames / elapsed)
+            self.frames = 0
+            self.window_start = now
+
+    def _adjust(self, fps):
+        if self.latency is None:
+            return
+        temperature = self.readings.temperature()
+        cpu = self.readings.cpu_load()
+        hot = temperature is not None and temperature >= self.max_temp
+        busy = cpu is not None and cpu >= self.max_cpu
+        sustainable = self.frame_skip / self.latency
+
+        level = self.level
+        if (hot or busy or sustainable < self.target_fps) and level < len(self.levels) - 1:
+            level += 1
+        elif level > 0 and not hot and not busy:
+            # Cost scales roughly with the number of input pixels
+            size, skip, _ = self.levels[level - 1]
+            predicted = self.latency * (size / self.imgsz) ** 2
+            cool = temperature is None or temperature < self.max_temp - 5
+            if cool and skip / predicted >= 1.3 * self.target_fps:
+                level -= 1
+        if level == self.level:
+            return
+
+        self.level = level
+        # The old latency says nothing about the new input size
+        self.latency = None
+        width, height = self.capture_size
+        readings = f"{fps:.1f} fps"
+        if temperature is not None:
+            readings += f", {temperature:.0f} °C"
+        if cpu is not None:
+            readings += f", CPU {cpu:.0%}"
+        self.pending = (f"Quality level {level}: input {self.imgsz} px, frame skip {self.frame_skip}, "
+                        f"capture {width}x{height} ({readings})")
+
+    def apply_capture(self, capture):
+        # Called from the capture stage, the only thread that touches the camera
+        size = self.capture_size
+        if size != self.applied_capture:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, size[0])
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, size[1])
+            self.applied_capture = size
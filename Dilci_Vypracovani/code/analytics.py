@@ -0,0 +1,83 @@
+import numpy as np
+
+
+class DetectionAnalytics:
+    # Running aggregates over every recorded detection, updated as detections
+    # come in so nothing ever rescans the history:
+    #   counts   (classes,) total per class
+    #   rates    ring of time buckets x classes, for "per hour" style queries
+    #   heatmap  classes x grid of box centres, normalised to the frame size
+    # Queries cost O(classes), O(buckets) or O(grid) however long the unit runs.
+    # With tracking on, the GUI only records newly started tracks, so counts
+    # are objects rather than object-frames.
+    def __init__(self, num_classes=80, bucket_seconds=60, buckets=24 * 60, grid=(32, 24)):
+        self.bucket_seconds = bucket_seconds
+        self.grid = grid
+        self.counts = np.zeros(num_classes, dtype=np.int64)
+        self.rates = np.zeros((buckets, num_classes), dtype=np.int64)
+        # Which absolute bucket each ring slot currently holds
+        self.bucket_ids = np.full(buckets, -1, dtype=np.int64)
+        self.heatmap = np.zeros((num_classes, grid[1], grid[0]), dtype=np.float32)
+
+    @property
+    def num_classes(self):
+        return len(self.counts)
+
+    def _grow(self, num_classes):
+        # Models with more than the expected classes widen every accumulator once
+        extra = num_classes - self.num_classes
+        self.counts = np.concatenate([self.counts, np.zeros(extra, dtype=np.int64)])
+        self.rates = np.concatenate([self.rates, np.zeros((len(self.rates), extra), dtype=np.int64)], axis=1)
+        self.heatmap = np.concatenate([self.heatmap, np.zeros((extra,) + self.heatmap.shape[1:], np.float32)])
+
+    def add(self, cls, boxes, timestamp, frame_shape=None):
+        if not len(cls):
+            return
+        cls = np.asarray(cls, dtype=np.int64)
+        if cls.max() >= self.num_classes:
+            self._grow(int(cls.max()) + 1)
+        per_class = np.bincount(cls, minlength=self.num_classes)
+        self.counts += per_class
+
+        bucket = int(timestamp // self.bucket_seconds)
+        slot = bucket % len(self.bucket_ids)
+        if self.bucket_ids[slot] != bucket:
+            self.rates[slot] = 0
+            self.bucket_ids[slot] = bucket
+        self.rates[slot] += per_class
+
+        if frame_shape is not None:
+            height, width = frame_shape[:2]
+            boxes = np.asarray(boxes, dtype=np.float32)
+            columns = ((boxes[:, 0] + boxes[:, 2]) * (0.5 * self.grid[0] / width)).astype(np.int64)
+            rows = ((boxes[:, 1] + boxes[:, 3]) * (0.5 * self.grid[1] / height)).astype(np.int64)
+            np.add.at(self.heatmap, (cls, np.clip(rows, 0, self.grid[1] - 1), np.clip(columns, 0, self.grid[0] - 1)), 1)
+
+    def window_counts(self, seconds, now):
+        # Detections per class within the last `seconds` (rounded to whole buckets)
+        newest = int(now // self.bucket_seconds)
+        oldest = newest - max(1, int(seconds // self.bucket_seconds)) + 1
+        live = (self.bucket_ids >= oldest) & (self.bucket_ids <= newest)
+        return self.rates[live].sum(axis=0)
+
+    def occupancy(self, cls=None):
+        # Heatmap of one class or of all of them, scaled to 0..1
+        heatmap = self.heatmap.sum(axis=0) if cls is None else self.heatmap[cls]
+        peak = heatmap.max()
+        return heatmap / peak if peak > 0 else heatmap
+
+    def save(self, path):
+        np.savez_compressed(path, counts=self.counts, rates=self.rates, bucket_ids=self.bucket_ids,
+                            heatmap=self.heatmap, bucket_seconds=self.bucket_seconds)
+
+    def load(self, path):
+        # Continues from an earlier run; a file with another bucket layout or grid is ignored
+        with np.load(path) as data:
+            if int(data["bucket_seconds"]) != self.bucket_seconds or data["rates"].shape[0] != len(self.rates) \
+                    or data["heatmap"].shape[1:] != self.heatmap.shape[1:]:
+                return False
+            self.counts = data["counts"].copy()
+            self.rates = data["rates"].copy()
+            self.bucket_ids = data["bucket_ids"].copy()
+            self.heatmap = data["heatmap"].copy()
+        return True
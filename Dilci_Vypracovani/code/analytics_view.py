@@ -0,0 +1,86 @@
+import time
+import tkinter as tk
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+ALL_CLASSES = "Všechny třídy"
+
+
+class AnalyticsWindow:
+    # Top-level window with the totals and last-hour rate of the most frequent
+    # classes next to the occupancy heatmap. It only reads the aggregates in
+    # DetectionAnalytics, so a refresh costs the same after an hour or a month.
+    def __init__(self, master, analytics, names, interval_ms=2000, on_close=None, top=10):
+        self.analytics = analytics
+        self.names = names
+        self.interval_ms = interval_ms
+        self.on_close = on_close
+        self.top = top
+
+        self.window = tk.Toplevel(master)
+        self.window.title("Statistiky")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        self.class_var = tk.StringVar(value=ALL_CLASSES)
+        self.class_menu = tk.OptionMenu(self.window, self.class_var, ALL_CLASSES)
+        self.class_menu.pack(anchor="w", padx=5, pady=5)
+
+        self.fig = Figure(figsize=(7, 3), dpi=80)
+        self.ax_counts = self.fig.add_subplot(1, 2, 1)
+        self.ax_heatmap = self.fig.add_subplot(1, 2, 2)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.window)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+        self.job = None
+        self.refresh()
+
+    def _select(self, name):
+        self.class_var.set(name)
+        self.refresh()
+
+    def _refresh_menu(self, present):
+        menu = self.class_menu["menu"]
+        menu.delete(0, "end")
+        for name in [ALL_CLASSES] + [self.names.get(cls, str(cls)) for cls in present]:
+            menu.add_command(label=name, command=lambda name=name: self._select(name))
+
+    def refresh(self):
+        if self.job is not None:
+            self.window.after_cancel(self.job)
+        analytics = self.analytics
+        counts = analytics.counts
+        hourly = analytics.window_counts(3600, time.time())
+        present = [int(cls) for cls in np.flatnonzero(counts)]
+        self._refresh_menu(present)
+
+        order = np.argsort(counts)[::-1][:self.top]
+        order = order[counts[order] > 0][::-1]
+        labels = [self.names.get(int(cls), str(cls)) for cls in order]
+        self.ax_counts.clear()
+        self.ax_counts.barh(labels, counts[order], color="#3a7bd5")
+        for y, cls in enumerate(order):
+            self.ax_counts.text(counts[cls], y, f" {hourly[cls]}/h", va="center", fontsize=7)
+        self.ax_counts.set_title("Celkem (za poslední hodinu)", fontsize=8)
+        self.ax_counts.tick_params(labelsize=7)
+
+        selected = self.class_var.get()
+        ids = {self.names.get(cls, str(cls)): cls for cls in present}
+        self.ax_heatmap.clear()
+        self.ax_heatmap.imshow(analytics.occupancy(ids.get(selected)), cmap="hot", interpolation="bilinear",
+                               vmin=0, vmax=1)
+        self.ax_heatmap.set_title(f"Obsazenost: {selected}", fontsize=8)
+        self.ax_heatmap.set_xticks([])
+        self.ax_heatmap.set_yticks([])
+
+        self.fig.tight_layout()
+        self.canvas.draw_idle()
+        self.job = self.window.after(self.interval_ms, self.refresh)
+
+    def close(self):
+        if self.job is not None:
+            self.window.after_cancel(self.job)
+        self.window.destroy()
+        if self.on_close is not None:
+            self.on_close()
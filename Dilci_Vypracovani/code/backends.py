@@ -0,0 +1,60 @@
+import os
+
+BACKENDS = ("pytorch", "torchscript", "onnx", "openvino")
+
+# File or directory name ultralytics gives each export next to the .pt weights
+_EXPORT_SUFFIX = {"torchscript": ".torchscript", "onnx": ".onnx", "openvino": "_openvino_model"}
+
+
+def exported_path(weights, backend, int8=False, half=False):
+    base = os.path.splitext(weights)[0]
+    variant = "_int8" if int8 else "_fp16" if half else ""
+    return f"{base}{variant}{_EXPORT_SUFFIX[backend]}"
+
+
+def export_model(weights, backend, imgsz=640, int8=False, half=False):
+    # Exports the PyTorch weights once; later runs load the cached file directly
+    target = exported_path(weights, backend, int8, half)
+    if os.path.exists(target):
+        return target
+    if int8 and backend == "torchscript":
+        raise ValueError("INT8 is not supported for the TorchScript backend")
+
+    from ultralytics import YOLO
+
+    print(f"Exporting {weights} to {backend}, this only happens once...")
+    model = YOLO(weights)
+    # ONNX INT8 is done below with onnxruntime's dynamic quantisation instead
+    export_int8 = int8 and backend == "openvino"
+    # Where ultralytics put the export depends on the options (OpenVINO INT8
+    # already goes to *_int8_openvino_model), so use the path it reports
+    exported = str(model.export(format=backend, imgsz=imgsz, half=half, int8=export_int8))
+
+    if int8 and backend == "onnx":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(exported, target, weight_type=QuantType.QUInt8)
+    elif os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+    return target
+
+
+def load_detector(weights, backend="pytorch", imgsz=640, int8=False, half=False):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, choose one of {', '.join(BACKENDS)}")
+    # ultralytics pulls in torch, which alone takes seconds to import on the Pi
+    from ultralytics import YOLO
+
+    if not weights.endswith(".pt"):
+        # Already exported (.onnx, .torchscript, *_openvino_model), load as is
+        model = YOLO(weights, task="detect")
+    elif backend == "pytorch":
+        if int8 or half:
+            print("INT8/FP16 need an exported backend, running the PyTorch model in FP32.")
+        model = YOLO(weights)
+        model.eval()
+    else:
+        model = YOLO(export_model(weights, backend, imgsz, int8, half), task="detect")
+    # Predictions pick the input size up from the model overrides, so every
+    # call site (camera, stills, batch) uses the size the model was exported for
+    model.overrides["imgsz"] = imgsz
+    return model
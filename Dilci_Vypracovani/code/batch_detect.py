@@ -0,0 +1,114 @@
+import csv
+import glob
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from detections import Detections
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def iter_image_paths(source):
+    # A directory is walked recursively, anything else is treated as a glob pattern
+    if os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(dirpath, filename)
+    else:
+        for path in sorted(glob.iglob(source, recursive=True)):
+            if os.path.isfile(path):
+                yield path
+
+
+class ImagePrefetcher:
+    # Decodes images on background threads into a bounded queue, so disk reads
+    # and JPEG decoding overlap with the forward pass instead of preceding it.
+    _DONE = object()
+
+    def __init__(self, paths, workers=2, depth=32):
+        self.paths = iter(paths)
+        self.paths_lock = threading.Lock()
+        self.output = queue.Queue(depth)
+        self.workers = workers
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def _next_path(self):
+        with self.paths_lock:
+            return next(self.paths, None)
+
+    def _worker(self):
+        while True:
+            path = self._next_path()
+            if path is None:
+                self.output.put(self._DONE)
+                return
+            self.output.put((path, cv2.imread(path)))
+
+    def __iter__(self):
+        finished = 0
+        while finished < self.workers:
+            item = self.output.get()
+            if item is self._DONE:
+                finished += 1
+                continue
+            yield item
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def result_rows(path, result, names):
+    detections = Detections.from_result(result)
+    return [
+        (path, names[cls], f"{conf:.4f}", *box)
+        for cls, conf, box in zip(detections.cls.tolist(), detections.conf.tolist(), detections.int_boxes().tolist())
+    ]
+
+
+def run_batch_detection(model, source, output_file="batch_results.csv", batch_size=8, workers=2):
+    processed = 0
+    detected = 0
+    start = time.perf_counter()
+
+    with open(output_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Image", "Object", "Confidence", "X1", "Y1", "X2", "Y2"])
+
+        for batch in iter_batches(ImagePrefetcher(iter_image_paths(source), workers=workers), batch_size):
+            unreadable = [path for path, image in batch if image is None]
+            for path in unreadable:
+                print(f"Skipping unreadable image {path}")
+            batch = [(path, image) for path, image in batch if image is not None]
+            if not batch:
+                continue
+
+            results = model([image for _, image in batch], verbose=False)
+            for (path, _), result in zip(batch, results):
+                rows = result_rows(path, result, model.names)
+                writer.writerows(rows)
+                detected += len(rows)
+            # Flush per batch so an interrupted overnight run keeps everything done so far
+            f.flush()
+
+            processed += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"Processed {processed} images ({processed / elapsed:.1f} img/s), {detected} detections")
+
+    print(f"Results written to {output_file}")
+    return processed, detected
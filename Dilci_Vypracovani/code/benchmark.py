@@ -0,0 +1,362 @@
+import argparse
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+import cv2
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+
+from backends import BACKENDS, load_detector
+from batch_detect import IMAGE_EXTENSIONS, iter_image_paths
+from detection_store import DetectionStore
+from detections import Detections, Annotator
+from pipeline import DetectionPipeline
+from video_source import VideoFileSource
+
+# Headless benchmark of the detection pipeline. Runs the same capture ->
+# inference -> render pipeline as the GUI on synthetic or recorded frames,
+# replaces the Tk-only parts (canvas, chart widget) with their off-screen
+# equivalents and writes the timings as JSON, e.g.
+#   python benchmark.py --backends pytorch onnx --imgsz 320 640 --chart both
+#   python benchmark.py --compare baseline.json
+
+STAGES = ("capture", "inference", "annotate", "display", "chart")
+PERCENTILES = (50, 90, 95, 99)
+
+
+class LoopedFrames:
+    # Pipeline source that plays a fixed set of frames in a loop, count frames in
+    # total (endlessly without count). With fps set it delivers them at that
+    # rate, like a camera would.
+    def __init__(self, frames, count=None, fps=None):
+        self.frames = frames
+        self.count = count
+        self.interval = 1.0 / fps if fps else 0.0
+        self.next_due = None
+        self.index = 0
+
+    def read(self):
+        if self.count is not None and self.index >= self.count:
+            return False, None
+        if self.interval:
+            now = time.perf_counter()
+            if self.next_due is not None and self.next_due > now:
+                time.sleep(self.next_due - now)
+            self.next_due = max(self.next_due or now, now) + self.interval
+        frame = self.frames[self.index % len(self.frames)].copy()
+        self.index += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+
+def synthetic_frames(width=640, height=480, seed=0, variants=8):
+    # Deterministic noise with a few solid shapes, generated up front so it
+    # does not show up in the capture timings
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(variants):
+        frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        for _ in range(4):
+            x, y = int(rng.integers(0, width - 60)), int(rng.integers(0, height - 60))
+            colour = tuple(int(c) for c in rng.integers(0, 256, 3))
+            cv2.rectangle(frame, (x, y), (x + 60, y + 60), colour, cv2.FILLED)
+        frames.append(frame)
+    return frames
+
+
+def recorded_frames(source, limit=300):
+    # A video file or a folder/glob of images, decoded up front
+    if os.path.isfile(source) and not source.lower().endswith(IMAGE_EXTENSIONS):
+        video = VideoFileSource(source)
+        frames = []
+        while len(frames) < limit:
+            ret, frame = video.read()
+            if not ret:
+                break
+            frames.append(frame)
+        video.release()
+    else:
+        paths = itertools.islice(iter_image_paths(source), limit)
+        frames = [frame for frame in (cv2.imread(path) for path in paths) if frame is not None]
+    if not frames:
+        raise IOError(f"No readable frames in {source}")
+    return frames
+
+
+class OffscreenDisplay:
+    # Everything FrameView.show does except handing the pixels to Tk
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def show(self, frame):
+        scale = min(self.width / frame.shape[1], self.height / frame.shape[0])
+        size = (max(1, int(frame.shape[1] * scale)), max(1, int(frame.shape[0] * scale)))
+        if size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_LINEAR)
+        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+class OffscreenChart:
+    # Same work as ConfidenceChart on an Agg canvas: rolling window, cached
+    # background and a line redraw at most max_fps times per second
+    def __init__(self, window=300, max_fps=4):
+        self.window = window
+        self.min_interval = 1.0 / max_fps
+        self.values = np.zeros(window, dtype=np.float32)
+        self.fig = Figure(figsize=(3, 2), dpi=80)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_xlim(0, window - 1)
+        self.ax.set_ylim(0, 1)
+        (self.line,) = self.ax.plot([], [], animated=True)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.last_draw = 0.0
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float32)[-self.window:]
+        if not len(values):
+            return
+        self.values = np.roll(self.values, -len(values))
+        self.values[-len(values):] = values
+        now = time.perf_counter()
+        if now - self.last_draw >= self.min_interval:
+            self.last_draw = now
+            self.line.set_data(np.arange(self.window), self.values)
+            self.canvas.restore_region(self.background)
+            self.ax.draw_artist(self.line)
+
+
+def summarise(samples):
+    if not samples:
+        return None
+    values = np.asarray(samples) * 1000
+    summary = {"mean_ms": round(float(values.mean()), 3)}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(float(np.percentile(values, p)), 3)
+    return summary
+
+
+def peak_rss_mb():
+    # resource only exists on Unix; on Windows the peak is left out
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_config(options, backend, imgsz, chart):
+    # Runs in its own process so peak memory belongs to this configuration only
+    start = time.perf_counter()
+    model = load_detector(options.model, backend, imgsz, options.int8, options.half)
+    load_seconds = time.perf_counter() - start
+
+    timings = {stage: [] for stage in STAGES}
+    annotator = Annotator(model.names)
+    store = DetectionStore(names=model.names)
+    display = OffscreenDisplay(options.display_width, options.display_height)
+    offscreen_chart = OffscreenChart() if chart else None
+
+    def timed(stage, work):
+        def wrapper(*args):
+            stage_start = time.perf_counter()
+            result = work(*args)
+            timings[stage].append(time.perf_counter() - stage_start)
+            return result
+        return wrapper
+
+    def record(packet):
+        # What record_detections does besides printing
+        detections = packet.detections
+        store.extend(detections.cls, detections.conf, detections.int_boxes(), packet.index, packet.timestamp)
+        offscreen_chart.extend(detections.conf)
+
+    if options.frames_from is None:
+        frames = synthetic_frames(options.width, options.height, options.seed)
+    else:
+        frames = recorded_frames(options.frames_from)
+    # Frames are counted where the model runs: with dropping queues a frame can
+    # be inferred and still be replaced before the display loop takes it
+    source = LoopedFrames(frames, fps=options.camera_fps)
+    source.read = timed("capture", source.read)
+    run_model = timed("inference", lambda frame: Detections.from_result(model(frame, verbose=False)[0]))
+    target = options.warmup + options.frames
+    latencies = []
+    run = {"inferred": 0, "start": time.perf_counter(), "end": None}
+
+    def infer(frame):
+        detections = run_model(frame)
+        run["inferred"] += 1
+        if run["inferred"] == options.warmup:
+            # Forget the warm-up frames (first forward passes, lazy allocations)
+            for samples in timings.values():
+                samples.clear()
+            latencies.clear()
+            run["start"] = time.perf_counter()
+        if run["inferred"] == target:
+            run["end"] = time.perf_counter()
+        return detections
+
+    pipeline = DetectionPipeline(source, infer, timed("annotate", annotator.draw), threaded=options.threaded,
+                                 lossless=options.lossless)
+
+    shown = 0
+    pipeline.start()
+    while run["end"] is None and not pipeline.done and pipeline.error is None:
+        packet = pipeline.latest() if pipeline.threaded else pipeline.step()
+        if packet is None:
+            if pipeline.threaded:
+                time.sleep(0.001)
+            continue
+        timed("display", display.show)(packet.annotated)
+        if offscreen_chart is not None:
+            timed("chart", record)(packet)
+        latencies.append(time.time() - packet.timestamp)
+        shown += 1
+    pipeline.stop()
+    if pipeline.error is not None:
+        raise pipeline.error
+    elapsed = (run["end"] or time.perf_counter()) - run["start"]
+    measured = max(0, min(run["inferred"], target) - options.warmup)
+
+    return {
+        "backend": backend,
+        "imgsz": imgsz,
+        "chart": chart,
+        "threaded": options.threaded,
+        "frames": measured,
+        "shown_frames": shown,
+        "dropped_frames": pipeline.dropped_frames,
+        "fps": round(measured / elapsed, 2) if elapsed > 0 else None,
+        "model_load_s": round(load_seconds, 3),
+        "latency": summarise(latencies),
+        "stages": {stage: summarise(samples) for stage, samples in timings.items() if samples},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def environment():
+    info = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+    }
+    for module in ("torch", "ultralytics", "onnxruntime", "openvino"):
+        try:
+            info[module] = __import__(module).__version__
+        except Exception:
+            pass
+    return info
+
+
+def config_key(config):
+    threads = "threaded" if config["threaded"] else "inline"
+    return f"{config['backend']}/{config['imgsz']}/chart={'on' if config['chart'] else 'off'}/{threads}"
+
+
+def compare(previous, current, tolerance):
+    # Prints the change per configuration and returns the ones that got slower than tolerance
+    baseline = {config_key(config): config for config in previous["configs"]}
+    regressions = []
+    for config in current["configs"]:
+        key = config_key(config)
+        old = baseline.get(key)
+        if old is None or not old["fps"] or not config["fps"]:
+            continue
+        fps_change = config["fps"] / old["fps"] - 1
+        # A run that showed no measured frames has no latency to compare
+        if config["latency"] and old["latency"]:
+            p95_change = config["latency"]["p95_ms"] / old["latency"]["p95_ms"] - 1
+            print(f"{key}: {old['fps']} -> {config['fps']} fps ({fps_change:+.1%}), "
+                  f"p95 latency {p95_change:+.1%}")
+        else:
+            p95_change = 0.0
+            print(f"{key}: {old['fps']} -> {config['fps']} fps ({fps_change:+.1%}), no latency measured")
+        if fps_change < -tolerance or p95_change > tolerance:
+            regressions.append(key)
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless benchmark of the detection pipeline")
+    parser.add_argument("--model", default="yolov8n.pt", help="weights file")
+    parser.add_argument("--backends", nargs="+", default=["pytorch"], choices=BACKENDS)
+    parser.add_argument("--imgsz", nargs="+", type=int, default=[640], help="model input sizes to compare")
+    parser.add_argument("--chart", choices=("on", "off", "both"), default="on", help="include the chart update")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--half", action="store_true")
+    parser.add_argument("--frames", type=int, default=200, help="measured frames per configuration")
+    parser.add_argument("--warmup", type=int, default=10, help="frames run before measuring")
+    parser.add_argument("--frames-from", help="video file or image folder/glob instead of synthetic frames")
+    parser.add_argument("--width", type=int, default=640, help="synthetic frame width")
+    parser.add_argument("--height", type=int, default=480, help="synthetic frame height")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic frames")
+    parser.add_argument("--display-width", type=int, default=640, help="size of the simulated canvas")
+    parser.add_argument("--display-height", type=int, default=480)
+    parser.add_argument("--camera-fps", type=float, help="deliver frames at this rate instead of as fast as possible")
+    parser.add_argument("--threaded", action="store_true", help="run the stages on worker threads like the GUI")
+    parser.add_argument("--lossless", action="store_true", help="never drop frames between stages")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the results")
+    parser.add_argument("--compare", help="earlier results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed slowdown before failing the comparison")
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    if options.threaded and not options.camera_fps and not options.lossless:
+        # A free-running source would only fill drop-oldest queues with frames nobody infers
+        print("--threaded without --camera-fps runs with lossless queues")
+        options.lossless = True
+    charts = {"on": [True], "off": [False], "both": [True, False]}[options.chart]
+    results = {"environment": environment(), "options": vars(options), "configs": []}
+
+    context = multiprocessing.get_context("spawn")
+    failed = []
+    for backend, imgsz, chart in itertools.product(options.backends, options.imgsz, charts):
+        print(f"Benchmarking {backend}, imgsz {imgsz}, chart {'on' if chart else 'off'}...")
+        with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+            config = executor.submit(run_config, options, backend, imgsz, chart).result()
+        results["configs"].append(config)
+        latency = config["latency"] or {}
+        print(f"  {config['fps']} fps, latency p50 {latency.get('p50_ms')} ms / p95 {latency.get('p95_ms')} ms, "
+              f"peak {config['peak_rss_mb']} MB")
+        if config["frames"] < options.frames:
+            failed.append(config_key(config))
+
+    if failed:
+        print(f"Fewer than {options.frames} frames measured for {', '.join(failed)}, no results written")
+        return 1
+    with open(options.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {options.output}")
+
+    if options.compare:
+        with open(options.compare) as f:
+            regressions = compare(json.load(f), results, options.tolerance)
+        if regressions:
+            print(f"Slower than {options.compare} by more than {options.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import time
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+
+class ConfidenceChart:
+    # Rolling confidence plot. New values go into a fixed-size window and the axes
+    # are drawn once; a refresh only restores the cached background and blits the
+    # line, at most max_fps times per second no matter how often extend() is called.
+    def __init__(self, master, window=300, max_fps=4):
+        self.window = window
+        self.min_interval = 1.0 / max_fps
+        self.values = np.zeros(window, dtype=np.float32)
+        self.count = 0
+
+        self.fig = Figure(figsize=(3, 2), dpi=80)
+        self.ax = self.fig.add_subplot()
+        self.ax.set_facecolor("#f0f0f0")
+        self.ax.set_title("Confidence Scores", fontsize=8)
+        self.ax.set_xlabel(f"Last {window} Detections")
+        self.ax.set_ylabel("Confidence Score")
+        self.ax.set_xlim(0, window - 1)
+        self.ax.set_ylim(0, 1)
+        (self.line,) = self.ax.plot([], [], color='blue', linewidth=2, animated=True)
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.widget = self.canvas.get_tk_widget()
+        self.widget.pack(fill="both", expand=True)
+
+        self.background = None
+        self.last_draw = 0.0
+        self.pending = None
+        # A full draw (first show, resize) invalidates the cached background
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self.canvas.draw_idle()
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=np.float32)[-self.window:]
+        n = len(values)
+        if n == 0:
+            return
+        self.count = min(self.window, self.count + n)
+        # Shift the window left so the newest value is always the last point
+        self.values = np.roll(self.values, -n)
+        self.values[-n:] = values
+        self.request_refresh()
+
+    def request_refresh(self):
+        if self.pending is not None:
+            return
+        delay = self.min_interval - (time.perf_counter() - self.last_draw)
+        self.pending = self.widget.after(max(0, int(delay * 1000)), self.refresh)
+
+    def refresh(self):
+        self.pending = None
+        self.last_draw = time.perf_counter()
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self._update_line()
+        self.canvas.restore_region(self.background)
+        self.ax.draw_artist(self.line)
+        self.canvas.blit(self.ax.bbox)
+
+    def _update_line(self):
+        data = self.values[self.window - self.count:]
+        x = np.arange(self.window - self.count, self.window)
+        # Never plot more points than the axes are wide in pixels
+        width = max(1, int(self.ax.bbox.width))
+        if len(data) > width:
+            step = -(-len(data) // width)
+            usable = len(data) - len(data) % step
+            data = data[len(data) - usable:].reshape(-1, step).max(axis=1)
+            x = x[len(x) - usable:][::step]
+        self.line.set_data(x, data)
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self._update_line()
+        self.ax.draw_artist(self.line)
@@ -0,0 +1,139 @@
+import asyncio
+import codecs
+import locale
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+
+class Job:
+    __slots__ = ("id", "command", "process", "cancelled")
+
+    def __init__(self, job_id, command):
+        self.id = job_id
+        self.command = command
+        self.process = None
+        self.cancelled = False
+
+
+class CommandRunner:
+    # Runs console commands on one asyncio loop in a background thread. stdout
+    # and stderr of every process are read concurrently in chunks, so a command
+    # that fills one pipe cannot block on the other, and each chunk is one
+    # output(text, error) call instead of one per line. At most max_concurrent
+    # commands run at once, the rest wait their turn. cancel() terminates the
+    # whole process group and kills it if it has not exited after kill_timeout.
+    def __init__(self, output, max_concurrent=2, kill_timeout=2.0, chunk_size=4096):
+        self.output = output
+        self.max_concurrent = max_concurrent
+        self.kill_timeout = kill_timeout
+        self.chunk_size = chunk_size
+        self.encoding = locale.getpreferredencoding(False)
+        self.jobs = {}
+        self.next_id = 1
+        self.lock = threading.Lock()
+        # Subprocesses need the proactor loop on Windows (not the default before Python 3.8)
+        self.loop = asyncio.ProactorEventLoop() if sys.platform == "win32" else asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run_loop, name="commands", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.ready.set()
+        self.loop.run_forever()
+
+    def submit(self, args, command=None):
+        with self.lock:
+            job = Job(self.next_id, command or " ".join(args))
+            self.jobs[job.id] = job
+            self.next_id += 1
+        asyncio.run_coroutine_threadsafe(self._run(job, args), self.loop)
+        return job.id
+
+    def running(self):
+        with self.lock:
+            return [(job.id, job.command, "running" if job.process is not None else "waiting")
+                    for job in self.jobs.values()]
+
+    def cancel(self, job_id=None):
+        # Without an id the newest job is cancelled
+        with self.lock:
+            if job_id is None:
+                job_id = max(self.jobs, default=None)
+            job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        self.loop.call_soon_threadsafe(self._terminate, job)
+        return True
+
+    def shutdown(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _run(self, job, args):
+        try:
+            async with self.semaphore:
+                if job.cancelled:
+                    return
+                try:
+                    # Own process group/session, so cancelling also reaches the command's children
+                    if sys.platform == "win32":
+                        job.process = await asyncio.create_subprocess_exec(
+                            *args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP
+                        )
+                    else:
+                        job.process = await asyncio.create_subprocess_exec(
+                            *args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, start_new_session=True
+                        )
+                except OSError as e:
+                    self.output(f"[{job.id}] {e}\n", True)
+                    return
+                await asyncio.gather(self._pump(job.process.stdout, False), self._pump(job.process.stderr, True))
+                code = await job.process.wait()
+                if job.cancelled:
+                    self.output(f"[{job.id}] cancelled\n", True)
+                elif code:
+                    self.output(f"[{job.id}] exited with code {code}\n", True)
+        finally:
+            with self.lock:
+                self.jobs.pop(job.id, None)
+
+    async def _pump(self, stream, error):
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        while True:
+            chunk = await stream.read(self.chunk_size)
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                self.output(text, error)
+            if not chunk:
+                return
+
+    def _terminate(self, job):
+        job.cancelled = True
+        if job.process is None or job.process.returncode is not None:
+            return
+        self._signal(job.process, force=False)
+        self.loop.call_later(self.kill_timeout, self._kill, job)
+
+    def _kill(self, job):
+        if job.process.returncode is None:
+            self._signal(job.process, force=True)
+
+    def _signal(self, process, force):
+        try:
+            if sys.platform == "win32":
+                if force:
+                    subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+                else:
+                    process.send_signal(signal.CTRL_BREAK_EVENT)
+            else:
+                os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        except (ProcessLookupError, OSError):
+            pass
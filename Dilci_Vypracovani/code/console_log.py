@@ -0,0 +1,108 @@
+import collections
+import logging
+import logging.handlers
+import threading
+import tkinter as tk
+
+DEBUG = logging.DEBUG
+# Per-detection lines, the noisiest thing the app prints
+DETECTION = 15
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+LEVELS = {"debug": DEBUG, "detection": DETECTION, "info": INFO, "warning": WARNING, "error": ERROR}
+
+logging.addLevelName(DETECTION, "DETECTION")
+
+
+class ConsoleLog:
+    # Log sink behind the console widget and sys.stdout. Any thread may call
+    # log()/write(): they only append to a bounded deque. pump() runs on the Tk
+    # thread every interval_ms and moves everything queued so far into the
+    # Text widget in one insert, trims it to max_lines and scrolls once, so a
+    # burst of detections costs one widget update instead of one per line.
+    # With log_file set the same lines also go to a rotating file.
+    def __init__(self, widget, level=DETECTION, max_lines=1000, interval_ms=100, max_pending=10000,
+                 log_file=None, max_bytes=5 * 1024 * 1024, backups=3):
+        self.widget = widget
+        self.level = level
+        self.max_lines = max_lines
+        self.interval_ms = interval_ms
+        # Oldest lines are dropped if the Tk thread falls behind
+        self.pending = collections.deque(maxlen=max_pending)
+        # Unfinished line written to sys.stdout, completed by the next write
+        self.partial = ""
+        self.lock = threading.Lock()
+        self.widget.tag_config("error", foreground="#ff6b6b")
+        self.widget.tag_config("warning", foreground="#ffd166")
+
+        self.file_logger = None
+        if log_file:
+            handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups,
+                                                           encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+            self.file_logger = logging.getLogger(f"console.{id(self)}")
+            self.file_logger.propagate = False
+            self.file_logger.setLevel(DEBUG)
+            self.file_logger.addHandler(handler)
+
+        self.job = self.widget.after(self.interval_ms, self.pump)
+
+    def log(self, message, level=INFO):
+        if level >= self.level and message:
+            self.pending.append((level, message))
+
+    # sys.stdout interface, so plain print() ends up here as INFO
+    def write(self, message):
+        # print() sends the text and its line ending as two writes; only whole
+        # lines are queued, so the widget and the log file never get fragments
+        with self.lock:
+            text = self.partial + message
+            end = text.rfind("\n") + 1
+            self.partial = text[end:]
+        if end:
+            self.log(text[:end], INFO)
+
+    def flush(self):
+        pass
+
+    def pump(self):
+        batch = []
+        while self.pending:
+            batch.append(self.pending.popleft())
+        if batch:
+            self._insert(batch)
+        self.job = self.widget.after(self.interval_ms, self.pump)
+
+    def _insert(self, batch):
+        # Consecutive messages with the same tag go in as one insert
+        chunks = []
+        for level, message in batch:
+            tag = "error" if level >= ERROR else "warning" if level >= WARNING else ""
+            if chunks and chunks[-1][0] == tag:
+                chunks[-1][1].append(message)
+            else:
+                chunks.append((tag, [message]))
+            if self.file_logger is not None:
+                self.file_logger.log(level, message.rstrip("\n"))
+        for tag, messages in chunks:
+            self.widget.insert(tk.END, "".join(messages), tag)
+
+        lines = int(self.widget.index("end-1c").split(".")[0])
+        if lines > self.max_lines:
+            self.widget.delete("1.0", f"{lines - self.max_lines + 1}.0")
+        self.widget.see(tk.END)
+
+    def close(self):
+        # Whatever is still queued goes out before the file is closed
+        self.widget.after_cancel(self.job)
+        if self.partial:
+            self.write("\n")
+        batch = []
+        while self.pending:
+            batch.append(self.pending.popleft())
+        if batch:
+            self._insert(batch)
+        if self.file_logger is not None:
+            for handler in self.file_logger.handlers:
+                handler.close()
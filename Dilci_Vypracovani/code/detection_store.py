@@ -0,0 +1,57 @@
+import numpy as np
+
+COLUMNS = ("cls", "conf", "boxes", "frame", "time")
+
+
+class DetectionStore:
+    # Fixed-capacity ring buffer of detections in preallocated NumPy columns.
+    # Adding a batch is at most two slice writes; once full, the oldest
+    # detections are overwritten.
+    # total counts every detection ever added, so readers can keep a cursor.
+    def __init__(self, capacity=100000, names=None):
+        self.capacity = capacity
+        self.names = names or {}
+        self.cls = np.zeros(capacity, dtype=np.int16)
+        self.conf = np.zeros(capacity, dtype=np.float32)
+        self.boxes = np.zeros((capacity, 4), dtype=np.int32)
+        self.frame = np.zeros(capacity, dtype=np.int64)
+        self.time = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self.total = 0
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def extend(self, cls, conf, boxes, frame_index, timestamp):
+        n = len(cls)
+        if n == 0:
+            return
+        if n > self.capacity:
+            cls, conf, boxes = cls[-self.capacity:], conf[-self.capacity:], boxes[-self.capacity:]
+            self.total += n - self.capacity
+            n = self.capacity
+        # At most two slice writes, one up to the end of the ring and one wrapped
+        start = self.total % self.capacity
+        first = min(n, self.capacity - start)
+        for dst, src in ((slice(start, start + first), slice(0, first)), (slice(0, n - first), slice(first, n))):
+            self.cls[dst] = cls[src]
+            self.conf[dst] = conf[src]
+            self.boxes[dst] = boxes[src]
+            self.frame[dst] = frame_index
+            self.time[dst] = timestamp
+        self.total += n
+        self.size = min(self.size + n, self.capacity)
+
+    def _indices(self, start_total):
+        # Ring positions of detections start_total..total-1, oldest first
+        start_total = max(start_total, self.total - self.size)
+        return np.arange(start_total, self.total) % self.capacity
+
+    def columns(self, since=0):
+        # Copies of every stored column, oldest first; since is a value of total
+        # from an earlier call, to get only what was added after it
+        idx = self._indices(since)
+        return {name: getattr(self, name)[idx] for name in COLUMNS}
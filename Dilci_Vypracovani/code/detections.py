@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+PALETTE = [
+    (255, 0, 0), (0, 200, 0), (0, 0, 255), (255, 160, 0), (200, 0, 200),
+    (0, 200, 200), (120, 60, 255), (60, 180, 120), (0, 120, 255), (180, 180, 0),
+]
+
+
+class Detections:
+    # Boxes, confidences and class ids of one image as NumPy arrays:
+    # boxes (N, 4) float32 xyxy, conf (N,) float32, cls (N,) int32 and, once
+    # tracked, ids (N,) int32 track ids.
+    __slots__ = ("boxes", "conf", "cls", "ids")
+
+    def __init__(self, boxes, conf, cls, ids=None):
+        self.boxes = boxes
+        self.conf = conf
+        self.cls = cls
+        self.ids = ids
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32))
+
+    @classmethod
+    def from_result(cls, result):
+        # One device-to-host copy of the whole (N, 6) xyxy/conf/cls tensor
+        data = result.boxes.data.cpu().numpy()
+        if len(data) == 0:
+            return cls.empty()
+        return cls(
+            np.ascontiguousarray(data[:, :4], dtype=np.float32),
+            data[:, 4].astype(np.float32),
+            data[:, 5].astype(np.int32),
+        )
+
+    @classmethod
+    def concatenate(cls, parts):
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls.empty()
+        return cls(
+            np.concatenate([part.boxes for part in parts]),
+            np.concatenate([part.conf for part in parts]),
+            np.concatenate([part.cls for part in parts]),
+        )
+
+    def __len__(self):
+        return len(self.conf)
+
+    def int_boxes(self):
+        return np.rint(self.boxes).astype(np.int32)
+
+    def select(self, mask):
+        return Detections(self.boxes[mask], self.conf[mask], self.cls[mask], None if self.ids is None else self.ids[mask])
+
+
+class Annotator:
+    # Draws detections with a per-class colour and a filled label background.
+    # Label sizes only depend on the class name (confidence is always "0.00"
+    # wide), so they are measured once per class.
+    def __init__(self, names, font_scale=0.5, thickness=2):
+        self.names = names
+        self.font = cv2.FONT_HERSHEY_SIMPLEX
+        self.font_scale = font_scale
+        self.thickness = thickness
+        self.labels = {}
+
+    def _label(self, cls):
+        label = self.labels.get(cls)
+        if label is None:
+            name = self.names[cls]
+            (width, height), baseline = cv2.getTextSize(f"{name} 0.00", self.font, self.font_scale, 1)
+            label = (name, width, height, baseline, PALETTE[cls % len(PALETTE)])
+            self.labels[cls] = label
+        return label
+
+    def draw(self, frame, detections, labels=True):
+        if not len(detections):
+            return frame
+        for (x1, y1, x2, y2), conf, cls in zip(detections.int_boxes().tolist(), detections.conf.tolist(),
+                                               detections.cls.tolist()):
+            name, width, height, baseline, colour = self._label(cls)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), colour, self.thickness)
+            if not labels:
+                continue
+            top = max(y1 - height - baseline, 0)
+            cv2.rectangle(frame, (x1, top), (x1 + width, top + height + baseline), colour, cv2.FILLED)
+            cv2.putText(frame, f"{name} {conf:.2f}", (x1, top + height), self.font, self.font_scale,
+                        (255, 255, 255), 1, cv2.LINE_AA)
+        return frame
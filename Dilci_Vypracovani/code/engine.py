@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from inference_workers import ArrayResult
+
+
+class Request:
+    __slots__ = ("frame", "imgsz", "future", "arrived")
+
+    def __init__(self, frame, imgsz):
+        self.frame = frame
+        self.imgsz = imgsz
+        self.future = Future()
+        self.arrived = time.monotonic()
+
+
+class DetectionEngine:
+    # The detection core without any GUI: frames from any number of threads
+    # are queued and one thread runs them through the model. Requests that
+    # arrive within max_delay of the oldest waiting one are grouped into a
+    # single forward pass of up to max_batch frames, so several clients cost
+    # one batched call instead of one call each. No request waits longer than
+    # max_delay for company; a lone request goes through on its own.
+    # model is anything called like the ultralytics model (in-process model,
+    # InferenceWorkerPool); results are the (N, 6) box arrays.
+    def __init__(self, model, max_batch=8, max_delay=0.01):
+        self.model = model
+        self.names = dict(model.names)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.requests = queue.Queue()
+        self.batches = 0
+        self.batched_frames = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._loop, name="engine", daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, imgsz=None):
+        # Returns a Future with the frame's box array
+        if self.closed:
+            raise RuntimeError("Detection engine is closed")
+        request = Request(frame, imgsz)
+        self.requests.put(request)
+        return request.future
+
+    def detect(self, frame, imgsz=None):
+        return self.submit(frame, imgsz).result()
+
+    def __call__(self, source, verbose=False, imgsz=None, **kwargs):
+        # Same call as the ultralytics model; a list is submitted at once so it lands in one batch
+        frames = source if isinstance(source, list) else [source]
+        futures = [self.submit(frame, imgsz) for frame in frames]
+        return [ArrayResult(future.result()) for future in futures]
+
+    def _collect(self):
+        first = self.requests.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = first.arrived + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                # Finish what was collected, then stop
+                self.requests.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            # The model takes one input size per call
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.imgsz, []).append(request)
+            for imgsz, requests in groups.items():
+                self._run(requests, imgsz)
+
+    def _run(self, requests, imgsz):
+        kwargs = {} if imgsz is None else {"imgsz": imgsz}
+        try:
+            results = self.model([request.frame for request in requests], verbose=False, **kwargs)
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+        self.batches += 1
+        self.batched_frames += len(requests)
+        for request, result in zip(requests, results):
+            data = result.boxes.data.cpu().numpy()
+            request.future.set_result(np.ascontiguousarray(data, dtype=np.float32))
+
+    @property
+    def mean_batch(self):
+        return self.batched_frames / self.batches if self.batches else 0.0
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.requests.put(None)
+            self.thread.join(5.0)
@@ -0,0 +1,162 @@
+import csv
+import os
+import queue
+import threading
+import time
+
+FORMATS = ("csv", "parquet", "arrow")
+
+
+def _load_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Arrow export need the pyarrow package (pip install pyarrow)")
+    return pyarrow
+
+
+class CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["Object", "Confidence", "X1", "Y1", "X2", "Y2", "Frame", "Time"])
+
+    def write(self, names, columns):
+        boxes = columns["boxes"]
+        for i in range(len(names)):
+            x1, y1, x2, y2 = boxes[i]
+            self.writer.writerow([
+                names[i], f"{columns['conf'][i]:.4f}", x1, y1, x2, y2, columns["frame"][i], f"{columns['time'][i]:.3f}"
+            ])
+        self.file.flush()
+
+    def size(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ArrowWriter:
+    # Parquet or Arrow IPC stream. Each submitted batch becomes one record batch
+    # (row group for Parquet), so memory use is bounded by the batch size.
+    def __init__(self, path, fmt):
+        pa = _load_pyarrow()
+        self.pa = pa
+        self.path = path
+        self.schema = pa.schema([
+            ("object", pa.string()),
+            ("cls", pa.int16()),
+            ("confidence", pa.float32()),
+            ("x1", pa.int32()),
+            ("y1", pa.int32()),
+            ("x2", pa.int32()),
+            ("y2", pa.int32()),
+            ("frame", pa.int64()),
+            ("time", pa.float64()),
+        ])
+        if fmt == "parquet":
+            self.writer = pa.parquet.ParquetWriter(path, self.schema)
+        else:
+            self.sink = pa.OSFile(path, "wb")
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def write(self, names, columns):
+        boxes = columns["boxes"]
+        batch = self.pa.record_batch([
+            self.pa.array(names, self.pa.string()),
+            self.pa.array(columns["cls"]),
+            self.pa.array(columns["conf"]),
+            self.pa.array(boxes[:, 0]),
+            self.pa.array(boxes[:, 1]),
+            self.pa.array(boxes[:, 2]),
+            self.pa.array(boxes[:, 3]),
+            self.pa.array(columns["frame"]),
+            self.pa.array(columns["time"]),
+        ], schema=self.schema)
+        if isinstance(self.writer, self.pa.parquet.ParquetWriter):
+            self.writer.write_table(self.pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def close(self):
+        self.writer.close()
+        if hasattr(self, "sink"):
+            self.sink.close()
+
+
+class DetectionExporter:
+    # Appends detection batches to disk on a background thread. The caller hands
+    # over only the columns added since its last submit, never the whole history.
+    # A new file is started once the current one exceeds rotate_bytes or is older
+    # than rotate_seconds.
+    def __init__(self, names, directory=".", fmt="csv", prefix="detections", rotate_bytes=None, rotate_seconds=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format {fmt}")
+        if fmt != "csv":
+            _load_pyarrow()
+        self.names = names
+        self.directory = directory
+        self.fmt = fmt
+        self.prefix = prefix
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+
+        self.queue = queue.Queue()
+        self.writer = None
+        self.opened_at = 0.0
+        self.rows = 0
+        self.files = []
+        self.error = None
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="exporter", daemon=True)
+        self.thread.start()
+
+    def submit(self, columns):
+        if len(columns["cls"]):
+            self.queue.put(columns)
+
+    def close(self, wait=False):
+        # The writer thread drains what is still queued before closing the file
+        self.queue.put(None)
+        if wait:
+            self.thread.join()
+
+    def _open(self):
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        extension = {"csv": "csv", "parquet": "parquet", "arrow": "arrows"}[self.fmt]
+        path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{len(self.files):03d}.{extension}")
+        self.writer = CsvWriter(path) if self.fmt == "csv" else ArrowWriter(path, self.fmt)
+        self.opened_at = time.time()
+        self.files.append(path)
+
+    def _should_rotate(self):
+        if self.rotate_bytes and self.writer.size() >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self.opened_at >= self.rotate_seconds
+
+    def _run(self):
+        try:
+            while True:
+                columns = self.queue.get()
+                if columns is None:
+                    break
+                if self.writer is None:
+                    self._open()
+                names = [self.names[int(c)] for c in columns["cls"]]
+                self.writer.write(names, columns)
+                self.rows += len(names)
+                if self._should_rotate():
+                    self.writer.close()
+                    self.writer = None
+        except Exception as e:
+            self.error = e
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+                self.writer = None
@@ -0,0 +1,68 @@
+import tkinter as tk
+
+import cv2
+from PIL import Image, ImageTk
+
+
+class FrameView:
+    # Shows BGR frames on a Tk canvas, letterboxed to keep the aspect ratio.
+    # The target size is only recomputed when the canvas or frame size changes,
+    # and a single PhotoImage/canvas item is reused by pasting new pixels into it.
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.item = None
+        self.photo = None
+        self.layout_key = None
+        self.frame_size = None
+        self.size = (0, 0)
+        self.scale = 1.0
+        self.offset = (0, 0)
+        self.canvas.bind("<Configure>", self._on_resize, add="+")
+
+    def _on_resize(self, event):
+        self.layout_key = None
+
+    def _layout(self, frame_width, frame_height):
+        canvas_width = max(1, self.canvas.winfo_width())
+        canvas_height = max(1, self.canvas.winfo_height())
+        key = (frame_width, frame_height, canvas_width, canvas_height)
+        if key != self.layout_key:
+            self.layout_key = key
+            self.frame_size = (frame_width, frame_height)
+            self.scale = min(canvas_width / frame_width, canvas_height / frame_height)
+            width = max(1, int(frame_width * self.scale))
+            height = max(1, int(frame_height * self.scale))
+            self.size = (width, height)
+            self.offset = ((canvas_width - width) // 2, (canvas_height - height) // 2)
+
+    def show(self, frame, live=True):
+        self._layout(frame.shape[1], frame.shape[0])
+        if live:
+            interpolation = cv2.INTER_LINEAR
+        else:
+            interpolation = cv2.INTER_AREA if self.scale < 1 else cv2.INTER_CUBIC
+        # Resize first so the colour conversion runs on the smaller image
+        if self.size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, self.size, interpolation=interpolation)
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+        if self.photo is not None and (self.photo.width(), self.photo.height()) == self.size:
+            self.photo.paste(image)
+        else:
+            self.photo = ImageTk.PhotoImage(image)
+            if self.item is None:
+                self.item = self.canvas.create_image(*self.offset, anchor=tk.NW, image=self.photo)
+                # Keep overlays such as the selection rectangle above the video
+                self.canvas.tag_lower(self.item)
+            else:
+                self.canvas.itemconfig(self.item, image=self.photo)
+        self.canvas.coords(self.item, *self.offset)
+
+    def clear(self):
+        if self.item is not None:
+            self.canvas.delete(self.item)
+        self.item = None
+        self.photo = None
+
+    def canvas_to_frame(self, x, y):
+        return (x - self.offset[0]) / self.scale, (y - self.offset[1]) / self.scale
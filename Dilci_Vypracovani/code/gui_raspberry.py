@@ -1,32 +1,61 @@
+import time
+
+STARTUP_TIME = time.perf_counter()
+
+import argparse
+import os
+import json
 import tkinter as tk
-from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
+from tkinter import filedialog, messagebox, simpledialog, ttk
+from PIL import Image
 import cv2
-import subprocess
 import threading
 import numpy as np
 import sys
-import torch
-import pandas as pd  
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
-from ultralytics import YOLO
-
-class OutputRedirector:
-    def __init__(self, text_widget):
-        self.text_widget = text_widget
-
-    def write(self, message):
-        if message != '\n':  
-            self.text_widget.insert(tk.END, message)
-            self.text_widget.see(tk.END)
+from pipeline import DetectionPipeline
+from batch_detect import run_batch_detection
+from backends import BACKENDS, load_detector
+from video_source import VideoFileSource, DetectionStreamWriter
+from detection_store import DetectionStore
+from exporter import DetectionExporter, FORMATS
+from frame_view import FrameView
+from detections import Detections, Annotator
+from motion import MotionGate
+from tracker import IoUTracker
+from roi import load_rois, save_rois, normalise, roi_pixels, roi_size, detect_in_roi, MIN_ROI_SIZE
+from tiling import detect_tiled
+from adaptive import QualityController, build_levels
+from multi_source import MultiStreamPipeline, StreamWindow, open_source
+from metrics import Metrics, MetricsServer
+from console_log import ConsoleLog, LEVELS, DETECTION, INFO, ERROR
+from command_runner import CommandRunner
+from still_cache import DetectionCache, image_digest
+from analytics import DetectionAnalytics
+from snapshots import SnapshotWriter, ClipRecorder, FORMATS as SNAPSHOT_FORMATS
+from inference_workers import InferenceWorkerPool
+from server import DetectionClient
+
+WHOLE_FRAME = "Celý snímek"
+CUSTOM_ROI = "Vlastní oblast"
+ALL_CLASSES = "Všechny třídy"
+
+MODEL_PATH = '/home/pi/maturitniprace/yolov8n.pt'
+
+
+def create_model(options):
+    # With --server the model stays loaded in server.py and this window is only a client
+    if options.server:
+        return DetectionClient(options.server)
+    if options.inference_workers:
+        return InferenceWorkerPool(options.model, options.backend, options.imgsz, options.int8, options.half,
+                                   options.inference_workers)
+    return load_detector(options.model, options.backend, options.imgsz, options.int8, options.half)
 
-    def flush(self):
-        pass  
 
 class ObjectDetectionApp:
-    def __init__(self, root):
+    def __init__(self, root, options=None):
         self.root = root
+        self.options = options or build_parser().parse_args([])
         self.root.title("Rozpoznávání Objektů")
         self.root.geometry("600x400")  
         self.root.minsize(600, 400)  
@@ -58,6 +87,7 @@ class ObjectDetectionApp:
         
         self.canvas = tk.Canvas(self.image_frame, bg="black", height=250)  
         self.canvas.pack(fill="both", expand=True)
+        self.frame_view = FrameView(self.canvas)
 
         
         self.console_frame = tk.Frame(self.image_console_frame, bg=frame_bg_color)
@@ -69,9 +99,13 @@ class ObjectDetectionApp:
         self.console_input = tk.Entry(self.console_frame, bg="#333333", fg="#ffffff", font=("Courier", 6), bd=1, relief="solid")
         self.console_input.pack(fill="x", padx=5, pady=5)
         self.console_input.bind("<Return>", self.execute_command)
+        self.console_input.bind("<Control-c>", self.cancel_command)
 
         
-        sys.stdout = OutputRedirector(self.console_output)
+        self.log = ConsoleLog(
+            self.console_output, LEVELS[self.options.log_level], self.options.log_lines,
+            log_file=self.options.log_file, max_bytes=int(self.options.log_max_mb * 1024 * 1024)
+        )
 
         self.redirect_console_output()
 
@@ -79,6 +113,13 @@ class ObjectDetectionApp:
         self.controls_frame = tk.Frame(root, bg=bg_color, width=120) 
         self.controls_frame.grid(row=1, column=1, padx=10, pady=10, sticky="ns")
 
+        self.status_label = tk.Label(
+            self.controls_frame, text="Načítání modelu...", bg=bg_color, fg=text_color, font=font_primary
+        )
+        self.status_label.pack(fill="x")
+        self.progress = ttk.Progressbar(self.controls_frame, mode="indeterminate")
+        self.progress.pack(fill="x", pady=5)
+
         
         self.load_image_btn = tk.Button(
             self.controls_frame, text="Načíst obrázek", command=self.load_image,
@@ -93,6 +134,12 @@ class ObjectDetectionApp:
         )
         self.toggle_camera_btn.pack(fill="x", pady=5)
 
+        self.load_video_btn = tk.Button(
+            self.controls_frame, text="Načíst video", command=self.load_video,
+            bg=accent_color, fg="white", font=font_bold, relief="flat", height=1
+        )
+        self.load_video_btn.pack(fill="x", pady=5)
+
         
         self.capture_image_btn = tk.Button(
             self.controls_frame, text="Vyfotit obrázek", command=self.capture_image,
@@ -108,11 +155,17 @@ class ObjectDetectionApp:
         self.detect_btn.pack(fill="x", pady=5)
 
         
-        self.export_csv_btn = tk.Button(
-            self.controls_frame, text="Exportovat do CSV", command=self.export_results_to_csv,
+        self.export_btn = tk.Button(
+            self.controls_frame, text=f"Exportovat do {self.options.export_format.upper()}", command=self.toggle_export,
             bg=accent_color, fg="white", font=font_bold, relief="flat", height=1
         )
-        self.export_csv_btn.pack(fill="x", pady=5)
+        self.export_btn.pack(fill="x", pady=5)
+
+        self.analytics_btn = tk.Button(
+            self.controls_frame, text="Statistiky", command=self.show_analytics,
+            bg=accent_color, fg="white", font=font_bold, relief="flat", height=1
+        )
+        self.analytics_btn.pack(fill="x", pady=5)
 
         
         self.edit_image_btn = tk.Button(
@@ -121,13 +174,52 @@ class ObjectDetectionApp:
         )
         self.edit_image_btn.pack(fill="x", pady=5)
 
+        self.rois = load_rois(self.options.roi_file)
+        self.roi = self.rois.get(self.options.roi)
+        self.roi_var = tk.StringVar(value=self.options.roi if self.roi is not None else WHOLE_FRAME)
+        self.roi_menu = tk.OptionMenu(self.controls_frame, self.roi_var, WHOLE_FRAME)
+        self.roi_menu.config(font=font_primary, relief="flat")
+        self.roi_menu.pack(fill="x", pady=5)
+        self.refresh_roi_menu()
+
+        self.save_roi_btn = tk.Button(
+            self.controls_frame, text="Uložit ROI", command=self.save_roi,
+            bg=accent_color, fg="white", font=font_bold, relief="flat", height=1
+        )
+        self.save_roi_btn.pack(fill="x", pady=5)
+
+        # Stills only: split large photos into overlapping tiles so small objects survive
+        self.tiles_var = tk.BooleanVar(value=self.options.tiles)
+        self.tiles_check = tk.Checkbutton(
+            self.controls_frame, text="Detekce po dlaždicích", variable=self.tiles_var,
+            bg=bg_color, fg=text_color, font=font_primary, anchor="w"
+        )
+        self.tiles_check.pack(fill="x", pady=5)
+
+        # Filters for detected stills, applied to cached results without running the model again
+        self.conf_scale = tk.Scale(
+            self.controls_frame, from_=0.25, to=1.0, resolution=0.05, orient="horizontal", label="Min. jistota",
+            command=lambda value: self.render_still(), bg=bg_color, fg=text_color, font=font_primary,
+            highlightthickness=0
+        )
+        self.conf_scale.pack(fill="x", pady=5)
+        self.class_var = tk.StringVar(value=ALL_CLASSES)
+        self.class_menu = tk.OptionMenu(self.controls_frame, self.class_var, ALL_CLASSES)
+        self.class_menu.config(font=font_primary, relief="flat")
+        self.class_menu.pack(fill="x", pady=5)
+        self.labels_var = tk.BooleanVar(value=True)
+        self.labels_check = tk.Checkbutton(
+            self.controls_frame, text="Popisky", variable=self.labels_var, command=self.render_still,
+            bg=bg_color, fg=text_color, font=font_primary, anchor="w"
+        )
+        self.labels_check.pack(fill="x", pady=5)
+
         
         self.chart_frame = tk.Frame(self.controls_frame, bg=bg_color)
         self.chart_frame.pack(fill="both", expand=True, pady=10)
 
         
-        self.create_chart()
-        self.update_chart([])  
+        self.root.after(0, self.create_chart)
 
         
         self.canvas.bind("<ButtonPress-1>", self.on_button_press)
@@ -139,238 +231,748 @@ class ObjectDetectionApp:
         root.grid_columnconfigure(0, weight=3)  
         root.grid_columnconfigure(1, weight=2)  
 
-       
-        self.load_model() 
 
         
         self.camera_active = False  
         self.is_paused = False  
 
         
-        self.detection_results = []
+        self.detection_results = DetectionStore(self.options.max_detections)
+        self.result_stream = None
+        self.exporter = None
+        self.quality = None
+        self.streams = []
+        self.stream_sources = []
+        self.still_cache = DetectionCache(self.options.still_cache)
+        self.still_detections = None
+        self.still_view = None
+        self.class_ids = {}
+        self.analytics = DetectionAnalytics()
+        self.snapshots = SnapshotWriter(
+            self.options.snapshot_dir, self.options.snapshot_format, self.options.snapshot_quality,
+            self.options.png_compression, on_error=lambda error: print(f"Saving failed: {error}")
+        )
+        self.clips = None
+        if self.options.clip_classes:
+            self.clips = ClipRecorder(self.snapshots, self.options.clip_classes, self.options.clip_pre,
+                                      self.options.clip_post, self.options.clip_cooldown)
+        # Camera frame behind the newest shown one, without boxes; what capture_image saves
+        self.last_frame = None
+        self.analytics_window = None
+        if self.options.analytics_file:
+            if os.path.exists(self.options.analytics_file) and self.analytics.load(self.options.analytics_file):
+                print(f"Statistics continue from {self.options.analytics_file}")
+            self.root.after(60000, self.save_analytics)
+        self.metrics = Metrics()
+        self.metrics_server = None
+        self.overlay_time = 0.0
+        if self.options.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, self.options.metrics_port)
+                print(f"Metrics served at {self.metrics_server.url}")
+            except OSError as e:
+                print(f"Cannot serve metrics on port {self.options.metrics_port}: {e}")
+        if self.options.metrics_file:
+            self.root.after(int(self.options.metrics_interval * 1000), self.write_metrics)
+        # Poll the pipeline about twice per target frame period instead of flat out
+        self.poll_ms = max(1, int(500 / self.options.target_fps)) if self.options.target_fps else 10
+
+        self.model_buttons = [self.toggle_camera_btn, self.load_video_btn, self.detect_btn, self.export_btn,
+                              self.analytics_btn]
+        self.window_ready_time = 0.0
+        self.root.after(0, self.on_window_ready)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.load_model()
 
     def load_model(self):
+        # The window is usable straight away; the model loads and warms up on a
+        # background thread while the progress bar runs
+        for button in self.model_buttons:
+            button.config(state="disabled")
+        self.progress.start(10)
+        self.model_result = None
+        self.model_thread = threading.Thread(target=self._load_model_worker, name="model-loader", daemon=True)
+        self.model_thread.start()
+        self.root.after(100, self.check_model_loaded)
+
+    def _load_model_worker(self):
         try:
-            self.model = YOLO('/home/pi/maturitniprace/yolov8n.pt') 
-            self.model.eval() 
-            print("Model byl úspěšně načten.")
+            start = time.perf_counter()
+            model = create_model(self.options)
+            loaded = time.perf_counter()
+            # The first forward pass builds graphs and allocates buffers, pay for it before the camera starts
+            model(np.zeros((self.options.imgsz, self.options.imgsz, 3), dtype=np.uint8), verbose=False)
+            self.model_timings = (loaded - start, time.perf_counter() - loaded)
+            self.model_result = model
         except Exception as e:
-            messagebox.showerror("Chyba", f"Nepodařilo se načíst model: {e}")
+            self.model_result = e
+
+    def check_model_loaded(self):
+        if self.model_thread.is_alive():
+            self.root.after(100, self.check_model_loaded)
+            return
+
+        self.progress.stop()
+        self.progress.pack_forget()
+        if isinstance(self.model_result, Exception):
+            self.status_label.config(text="Model se nepodařilo načíst")
+            messagebox.showerror("Chyba", f"Nepodařilo se načíst model: {self.model_result}")
+            return
+
+        self.model = self.model_result
+        self.annotator = Annotator(self.model.names)
+        self.detection_results.names = self.model.names
+        self.metrics.names = self.model.names
+        self.status_label.pack_forget()
+        for button in self.model_buttons:
+            button.config(state="normal")
+
+        load_time, warmup_time = self.model_timings
+        print("Model byl úspěšně načten.")
+        print(f"Startup: window {self.window_ready_time:.2f} s, model load {load_time:.2f} s, "
+              f"warm-up {warmup_time:.2f} s, ready {time.perf_counter() - STARTUP_TIME:.2f} s")
+
+        if self.options.video:
+            self.start_video(self.options.video)
+
+    def on_window_ready(self):
+        self.window_ready_time = time.perf_counter() - STARTUP_TIME
 
     def redirect_console_output(self):
-        
-        sys.stdout = OutputRedirector(self.console_output)
+        sys.stdout = self.log
+        self.commands = CommandRunner(self.insert_to_console, self.options.max_commands)
         self.run_command("echo Připojení k systému úspěšné")
 
     def run_command(self, command):
-       
-        def execute():
-            process = subprocess.Popen(["bash", "-c", command], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            for line in iter(process.stdout.readline, ""):
-                self.insert_to_console(line)
-            for line in iter(process.stderr.readline, ""):
-                self.insert_to_console(line, error=True)
-            process.stdout.close()
-            process.stderr.close()
-            process.wait()
-
-        thread = threading.Thread(target=execute)
-        thread.start()
-
-    def insert_to_console(self, line, error=False):
-        
-        self.root.after(0, lambda: self.console_output.insert(tk.END, line if not error else f"[ERROR] {line}", "error" if error else None))
-        self.root.after(0, lambda: self.console_output.see(tk.END))
+        return self.commands.submit(["bash", "-c", command], command)
+
+    def insert_to_console(self, text, error=False):
+        # Called from the command runner's thread, the log sink does the batching
+        self.log.log(text, ERROR if error else INFO)
 
     def execute_command(self, event):
-        
-        command = self.console_input.get()
-        if command.strip():
-            self.console_output.insert(tk.END, f"> {command}\n")
-            self.console_input.delete(0, tk.END)
-            self.run_command(command)
+        command = self.console_input.get().strip()
+        if not command:
+            return
+        self.log.log(f"> {command}\n")
+        self.console_input.delete(0, tk.END)
+        # ":jobs" and ":kill [id ...]" are handled here instead of by the shell; the colon
+        # keeps them apart from shell commands such as kill <pid>
+        words = command.split()
+        if words == [":jobs"]:
+            jobs = self.commands.running()
+            lines = [f"[{job_id}] {state}: {text}\n" for job_id, text, state in jobs]
+            self.log.log("".join(lines) or "No running commands\n")
+        elif words[0] == ":kill" and all(word.isdigit() for word in words[1:]):
+            for job_id in [int(word) for word in words[1:]] or [None]:
+                if not self.commands.cancel(job_id):
+                    self.log.log("No running commands\n" if job_id is None else f"No such command: {job_id}\n", ERROR)
+        else:
+            job_id = self.run_command(command)
+            self.log.log(f"[{job_id}] started\n")
+
+    def cancel_command(self, event):
+        # Ctrl+C in the console entry stops the newest command
+        self.commands.cancel()
+        return "break"
 
     def load_image(self):
         file_path = filedialog.askopenfilename()
         if file_path:
-            self.image = cv2.imread(file_path)
-            self.display_image(self.image)
+            image = cv2.imread(file_path)
+            if image is None:
+                print(f"Cannot read {file_path}")
+                return
+            self.image = image
+            self.image_digest = image_digest(image)
+            self.still_detections = None
+            self.still_view = None
+            self.display_image(self.image, live=False)
 
     def toggle_camera(self):
         if not self.camera_active:
-            self.start_camera()  
-            self.toggle_camera_btn.config(text="Vypnout Kameru") 
+            if self.options.sources:
+                if not self.start_streams():
+                    return
+            else:
+                self.start_camera()
+            self.toggle_camera_btn.config(text="Vypnout Kameru")
         else:
-            self.stop_camera()  
-            self.toggle_camera_btn.config(text="Spustit Kameru") 
+            self.stop_camera()
+            self.toggle_camera_btn.config(text="Spustit Kameru")
+
+    def start_streams(self):
+        # Several cameras or videos at once, sharing one batched forward pass
+        sources = []
+        try:
+            for spec in self.options.sources:
+                sources.append(open_source(spec))
+        except IOError as e:
+            for source in sources:
+                source.release()
+            messagebox.showerror("Chyba", str(e))
+            return False
+        # The first stream uses the main canvas and store, the others get their own window
+        self.streams = [(self.options.sources[0], self.frame_view, self.detection_results, None)]
+        for spec in self.options.sources[1:]:
+            window = StreamWindow(self.root, f"Zdroj {spec}")
+            window.window.protocol("WM_DELETE_WINDOW", self.toggle_camera)
+            store = DetectionStore(self.options.max_detections, self.model.names)
+            self.streams.append((spec, window.view, store, window))
+        self.stream_sources = sources
+        # Drawn on a copy like annotate_frame, packet.frame stays clean for snapshots; streams are
+        # detected on the whole frame, so no ROI is drawn
+        self.pipeline = MultiStreamPipeline(sources, self.run_model_batch,
+                                            lambda frame, detections: self.annotator.draw(frame.copy(), detections))
+        self.pipeline.start()
+        self.camera_active = True
+        self.process_streams()
+        return True
+
+    def stop_streams(self):
+        self.pipeline.stop()
+        for source in self.stream_sources:
+            source.release()
+        if self.pipeline.batches:
+            print(f"{self.pipeline.batched_frames} frames in {self.pipeline.batches} batches "
+                  f"({self.pipeline.batched_frames / self.pipeline.batches:.1f} frames per forward pass)")
+        for _, view, _, window in self.streams:
+            view.clear()
+            if window is not None:
+                window.destroy()
+        self.streams = []
+        self.stream_sources = []
+        self.camera_active = False
+        self.canvas.delete("all")
+
+    def process_streams(self):
+        if self.camera_active and self.streams:
+            if self.pipeline.error is not None:
+                print(f"Pipeline error: {self.pipeline.error}")
+                self.stop_camera()
+                self.toggle_camera_btn.config(text="Spustit Kameru")
+                return
+            for stream, (_, view, store, _) in enumerate(self.streams):
+                for detections, index, timestamp, shape in self.pipeline.new_detections(stream):
+                    if stream == 0:
+                        self.record_detections(detections, index, timestamp, shape)
+                    else:
+                        store.extend(detections.cls, detections.conf, detections.int_boxes(), index, timestamp)
+                packet = self.pipeline.latest(stream)
+                if packet is None:
+                    continue
+                view.show(packet.annotated)
+                if stream == 0:
+                    self.remember_frame(packet)
+            if self.pipeline.done:
+                self.stop_camera()
+                self.toggle_camera_btn.config(text="Spustit Kameru")
+                return
+            self.root.after(self.poll_ms, self.process_streams)
+
+    def run_model_batch(self, frames):
+        return [Detections.from_result(result) for result in self.model(frames, verbose=False)]
 
     def start_camera(self):
         self.capture = cv2.VideoCapture(0)
         self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.camera_active = True  
-        self.process_video()  
+        if self.options.target_fps:
+            # Exported models are fixed to the size they were exported with
+            dynamic_size = self.options.backend == "pytorch" and self.options.model.endswith(".pt")
+            self.quality = QualityController(
+                self.options.target_fps, build_levels(self.options.imgsz, (640, 480), dynamic_size),
+                max_temp=self.options.max_temp, max_cpu=self.options.max_cpu
+            )
+        self.start_pipeline(controller=self.quality)
+
+    def load_video(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Video", "*.mp4 *.avi *.mkv *.mov"), ("All files", "*.*")])
+        if file_path:
+            if self.camera_active:
+                self.stop_camera()
+            self.start_video(file_path)
+
+    def start_video(self, path):
+        try:
+            self.capture = VideoFileSource(
+                path, stride=self.options.stride, start=self.options.start, end=self.options.end,
+                realtime=not self.options.fast
+            )
+        except IOError as e:
+            messagebox.showerror("Chyba", str(e))
+            return
+        self.result_stream = DetectionStreamWriter(self.options.video_output, self.model.names, fps=self.capture.fps)
+        print(f"Analysing {path}, results are written to {self.options.video_output}")
+        # Offline footage must not lose frames; fast mode decouples it from the Tk cadence
+        self.start_pipeline(sink=self.result_stream.write, lossless=True, threaded=self.options.fast or None)
+        self.toggle_camera_btn.config(text="Vypnout Kameru")
+
+    def start_pipeline(self, sink=None, lossless=False, threaded=None, controller=None):
+        if threaded is None:
+            threaded = not self.options.no_threads
+        gate = None
+        if self.options.motion_gate:
+            gate = MotionGate(
+                self.options.motion_method, self.options.motion_threshold, self.options.motion_area,
+                self.options.heartbeat
+            )
+        tracker = None
+        if self.options.track:
+            tracker = IoUTracker(self.options.track_iou, self.options.track_max_misses)
+        self.pipeline = DetectionPipeline(
+            self.capture, self.run_model, self.annotate_frame, threaded=threaded, sink=sink, lossless=lossless,
+            gate=gate, tracker=tracker, detect_every=self.options.detect_every, controller=controller,
+            metrics=self.metrics
+        )
+        self.pipeline.start()
+        self.camera_active = True
+        self.process_video()
 
     def stop_camera(self):
-        if hasattr(self, 'capture'):
-            self.capture.release() 
-            self.camera_active = False 
-            self.canvas.delete("all")  
+        if self.streams:
+            self.stop_streams()
+        elif hasattr(self, 'capture'):
+            # Stop the workers first so nothing reads from a released capture
+            self.pipeline.stop()
+            gate = self.pipeline.gate
+            if gate is not None and gate.checked:
+                print(f"Motion gate skipped {gate.skipped} of {gate.checked} frames")
+            self.capture.release()
+            self.camera_active = False
+            self.quality = None
+            self.last_frame = None
+            self.frame_view.clear()
+            self.canvas.delete("all")
+            if self.result_stream is not None:
+                self.result_stream.close()
+                self.result_stream = None
 
     def process_video(self):
-        if hasattr(self, "capture") and not self.is_paused:
-            ret, frame = self.capture.read()
-            if ret:
-                
-                results = self.model(frame)
-
-               
-                if results:
-                    
-                    result = results[0]  
-                    boxes = result.boxes  
-
-                    for box in boxes:
-                        
-                        x1, y1, x2, y2 = box.xyxy[0]  
-                        conf = box.conf[0]  
-                        cls = box.cls[0]  
-
-                        
-                        cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2)  
-                        cv2.putText(frame, f'{self.model.names[int(cls)]} {conf:.2f}', (int(x1), int(y1) - 10),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)  
-
-                        
-                        print(f'Detected: {self.model.names[int(cls)]} with confidence {conf:.2f}\n')  
-                        self.detection_results.append((self.model.names[int(cls)], conf, int(x1), int(y1), int(x2), int(y2)))  
-
-                
-                self.display_image(frame)
-
-                
-                self.update_chart([result[1] for result in self.detection_results])  
-
-                
-                self.root.after(10, self.process_video)
-
-    def display_image(self, image):
-        
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image = Image.fromarray(image)
-
-        
-        canvas_width = self.canvas.winfo_width()
-        canvas_height = self.canvas.winfo_height()
-        image = image.resize((canvas_width, canvas_height), Image.LANCZOS)
-
-        image = ImageTk.PhotoImage(image)
-        self.canvas.create_image(0, 0, anchor=tk.NW, image=image)
-        self.canvas.image = image
+        if self.camera_active and not self.is_paused:
+            if self.pipeline.threaded:
+                packet = self.pipeline.latest()
+            else:
+                packet = self.pipeline.step()
+
+            if self.pipeline.error is not None:
+                print(f"Pipeline error: {self.pipeline.error}")
+                self.stop_camera()
+                self.toggle_camera_btn.config(text="Spustit Kameru")
+                return
+
+            if packet is not None:
+                start = time.perf_counter()
+                self.display_image(packet.annotated)
+                self.metrics.observe("display", time.perf_counter() - start)
+                self.metrics.frame_shown()
+                self.remember_frame(packet)
+                self.metrics.gauge("dropped_frames", self.pipeline.dropped_frames)
+                if self.options.overlay:
+                    self.update_overlay()
+
+            # Every forward pass is recorded, not only the frames that made it to the screen.
+            # Video files stream their detections to disk from the render worker
+            for detections, index, timestamp, shape in self.pipeline.new_detections():
+                if self.result_stream is None:
+                    self.record_detections(detections, index, timestamp, shape)
+
+            if self.quality is not None:
+                self.metrics.gauge("quality_level", self.quality.level)
+            if self.quality is not None and self.quality.pending:
+                print(self.quality.pending)
+                self.quality.pending = None
+
+            if self.pipeline.done:
+                self.finish_video()
+                return
+
+            self.root.after(self.poll_ms, self.process_video)
+
+    def update_overlay(self):
+        # FPS and stage latencies (p50/p95) in the corner, redrawn twice a second
+        now = time.perf_counter()
+        if now - self.overlay_time < 0.5:
+            return
+        self.overlay_time = now
+        text = self.metrics.overlay_text()
+        if not self.canvas.find_withtag("overlay"):
+            self.canvas.create_text(8, 8, anchor="nw", fill="yellow", font=("Helvetica", 8), tags="overlay")
+        self.canvas.itemconfig("overlay", text=text)
+        self.canvas.tag_raise("overlay")
+
+    def write_metrics(self):
+        try:
+            self.metrics.write(self.options.metrics_file)
+        except OSError as e:
+            print(f"Cannot write metrics to {self.options.metrics_file}: {e}")
+        self.root.after(int(self.options.metrics_interval * 1000), self.write_metrics)
+
+    def finish_video(self):
+        if self.result_stream is not None:
+            print(f"Video finished: {self.result_stream.frames} frames analysed, "
+                  f"{self.result_stream.rows} detections written to {self.result_stream.path}")
+        self.stop_camera()
+        self.toggle_camera_btn.config(text="Spustit Kameru")
+
+    def detect(self, image, imgsz=None):
+        if imgsz is None:
+            return Detections.from_result(self.model(image, verbose=False)[0])
+        return Detections.from_result(self.model(image, imgsz=imgsz, verbose=False)[0])
+
+    def detect_tiles(self, image):
+        tile = self.options.tile_size or self.options.imgsz
+        detections, timings = detect_tiled(
+            self.model, image, tile, self.options.tile_overlap, self.options.tile_batch
+        )
+        seconds = [elapsed for _, _, elapsed in timings]
+        print(f"{len(timings)} tiles of {tile} px: {1000 * np.mean(seconds):.0f} ms per tile "
+              f"(slowest {1000 * max(seconds):.0f} ms), {sum(seconds):.2f} s in total")
+        return detections
+
+    def run_model(self, frame):
+        # Inference stage of the pipeline: only the ROI goes through the model
+        quality = self.quality
+        if quality is None:
+            return detect_in_roi(self.detect, frame, self.roi)
+        return detect_in_roi(lambda image: self.detect(image, quality.imgsz), frame, self.roi)
+
+    def annotate_frame(self, frame, detections):
+        # Runs on the render worker in threaded mode, so it must not touch Tk widgets.
+        # Draws on a copy: packet.frame stays the clean camera frame snapshots save
+        frame = frame.copy()
+        roi = self.roi
+        if roi is not None:
+            x1, y1, x2, y2 = roi_pixels(roi, frame.shape[1], frame.shape[0])
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 0, 255), 1)
+        return self.annotator.draw(frame, detections)
+
+    def record_detections(self, detections, frame_index, timestamp, frame_shape=None):
+        if not len(detections):
+            return
+        names = self.model.names
+        if detections.ids is None:
+            self.log.log("".join(f'Detected: {names[cls]} with confidence {conf:.2f}\n'
+                                 for cls, conf in zip(detections.cls.tolist(), detections.conf.tolist())), DETECTION)
+        else:
+            self.log.log("".join(f'Detected: {names[cls]} (track {track_id}) with confidence {conf:.2f}\n'
+                                 for cls, conf, track_id in zip(detections.cls.tolist(), detections.conf.tolist(),
+                                                                detections.ids.tolist())), DETECTION)
+        self.detection_results.extend(detections.cls, detections.conf, detections.int_boxes(), frame_index, timestamp)
+        self.analytics.add(detections.cls, detections.boxes, timestamp, frame_shape)
+        self.update_chart(detections.conf)
+
+    def display_image(self, image, live=True):
+        self.frame_view.show(image, live=live)
+
+    def remember_frame(self, packet):
+        self.last_frame = packet.frame
+        if self.clips is not None:
+            path = self.clips.add(packet.annotated, packet.timestamp, packet.results, self.model.names)
+            if path is not None:
+                print(f"Event clip queued as {path}")
 
     def capture_image(self):
-        if self.camera_active and hasattr(self, 'capture'):
-            ret, frame = self.capture.read()
-            if ret:
-                
-                filename = "captured_image.png"
-                cv2.imwrite(filename, frame)
-                print(f"Image captured and saved as {filename}\n")
+        # Saves the frame on screen instead of reading the camera a second time;
+        # encoding and writing happen on the snapshot writer's threads
+        if self.camera_active and self.last_frame is not None:
+            path = self.snapshots.save(self.last_frame)
+            if path is not None:
+                print(f"Image captured and saved as {path}")
             else:
-                print("Failed to capture image.\n")
+                print("Snapshot queue is full, image skipped.")
         else:
-            print("Camera is not active.\n")
+            print("Camera is not active.")
 
     def detect_objects(self):
-        
         if hasattr(self, "image"):
-            results = self.model(self.image)
-            if results:
-                boxes = results[0].boxes 
-                for box in boxes:
-                    
-                    x1, y1, x2, y2 = box.xyxy[0]
-                    conf = box.conf[0]
-                    cls = box.cls[0]
-
-                    
-                    cv2.rectangle(self.image, (int(x1), int(y1)), (int(x2), int(y2)), (255, 0, 0), 2) 
-                    cv2.putText(self.image, f'{self.model.names[int(cls)]} {conf:.2f}', (int(x1), int(y1) - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2) 
-
-                    
-                    print(f'Detected: {self.model.names[int(cls)]} with confidence {conf:.2f}\n')  
-                    self.detection_results.append((self.model.names[int(cls)], conf, int(x1), int(y1), int(x2), int(y2)))  
-
-                
-                self.display_image(self.image)
-                
-                self.update_chart([result[1] for result in self.detection_results]) 
-            else:
-                print("No objects detected.")
+            self.run_still_detection()
         else:
             print("Please load an image first!")
 
+    def run_still_detection(self):
+        tiles = self.tiles_var.get()
+        options = self.options
+        config = (options.model, options.backend, options.imgsz, options.int8, options.half, self.roi,
+                  (options.tile_size, options.tile_overlap) if tiles else None)
+        key = (self.image_digest, config)
+        detections = self.still_cache.get(key)
+        if detections is None:
+            detect = self.detect_tiles if tiles else self.detect
+            detections = detect_in_roi(detect, self.image, self.roi)
+            self.still_cache.put(key, detections)
+            # Only a fresh forward pass is recorded, detecting the same image again adds no rows
+            self.record_detections(detections, -1, time.time(), self.image.shape)
+        if not len(detections):
+            print("No objects detected.")
+        self.still_detections = detections
+        self.refresh_class_menu()
+        self.render_still()
+
+    def render_still(self):
+        # Draws the cached detections onto a copy; the loaded image itself is never modified
+        if self.camera_active or self.still_detections is None:
+            return
+        detections = self.still_detections
+        mask = detections.conf >= self.conf_scale.get()
+        if self.class_var.get() != ALL_CLASSES:
+            mask &= detections.cls == self.class_ids[self.class_var.get()]
+        self.still_view = self.annotator.draw(self.image.copy(), detections.select(mask), self.labels_var.get())
+        self.display_image(self.still_view, live=False)
+
+    def refresh_class_menu(self):
+        names = self.model.names
+        self.class_ids = {names[cls]: cls for cls in set(self.still_detections.cls.tolist())}
+        if self.class_var.get() not in self.class_ids:
+            self.class_var.set(ALL_CLASSES)
+        menu = self.class_menu["menu"]
+        menu.delete(0, "end")
+        for name in [ALL_CLASSES] + sorted(self.class_ids):
+            menu.add_command(label=name, command=lambda name=name: self.select_class(name))
+
+    def select_class(self, name):
+        self.class_var.set(name)
+        self.render_still()
+
     def edit_image(self):
-        
         if hasattr(self, "image"):
-            self.image = cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB)
-            self.image = Image.fromarray(self.image)
-            self.image.show() 
+            shown = self.still_view if self.still_view is not None else self.image
+            Image.fromarray(cv2.cvtColor(shown, cv2.COLOR_BGR2RGB)).show()
         else:
             print("Please load an image first!")
 
     def create_chart(self):
-       
-        self.fig, self.ax = plt.subplots(figsize=(3, 2), dpi=80)
-        self.ax.set_facecolor("#f0f0f0")
-        self.ax.set_title("Confidence Scores", fontsize=8)
-        self.ax.set_xlabel("Detection Index")
-        self.ax.set_ylabel("Confidence Score")
-
-        
-        self.canvas_chart = FigureCanvasTkAgg(self.fig, master=self.chart_frame)
-        self.canvas_chart.get_tk_widget().pack(fill="both", expand=True)
+        # matplotlib is only imported here, after the window is already on screen
+        from chart import ConfidenceChart
+        self.chart = ConfidenceChart(self.chart_frame, window=self.options.chart_window, max_fps=self.options.chart_fps)
 
     def update_chart(self, data):
-       
-        self.ax.clear()
-        self.ax.set_title("Confidence Scores", fontsize=8)
-        self.ax.set_xlabel("Detection Index")
-        self.ax.set_ylabel("Confidence Score")
-        self.ax.plot(data, color='blue', linewidth=2)
-        self.fig.canvas.draw()
-
-    def export_results_to_csv(self):
-        if self.detection_results:
-            
-            df = pd.DataFrame(self.detection_results, columns=["Object", "Confidence", "X1", "Y1", "X2", "Y2"])
-            
-            
-            output_file = "detection_results.csv"
-            
-            
-            df.to_csv(output_file, index=False)
-            print(f"Results exported to {output_file}\n")
+        # data holds only the confidences that are new since the last call
+        if hasattr(self, "chart"):
+            self.chart.extend(data)
+
+    def show_analytics(self):
+        if self.analytics_window is not None:
+            self.analytics_window.window.lift()
+            return
+        # Imported on first use like the chart, it pulls in matplotlib's Tk backend
+        from analytics_view import AnalyticsWindow
+        self.analytics_window = AnalyticsWindow(self.root, self.analytics, self.model.names,
+                                                on_close=self.analytics_closed)
+
+    def analytics_closed(self):
+        self.analytics_window = None
+
+    def save_analytics(self, reschedule=True):
+        try:
+            self.analytics.save(self.options.analytics_file)
+        except OSError as e:
+            print(f"Cannot save statistics to {self.options.analytics_file}: {e}")
+        if reschedule:
+            self.root.after(60000, self.save_analytics)
+
+    def toggle_export(self):
+        if self.exporter is None:
+            self.start_export()
         else:
-            print("No detection results to export.")
+            self.stop_export()
+
+    def start_export(self):
+        options = self.options
+        try:
+            self.exporter = DetectionExporter(
+                self.model.names, options.export_dir, options.export_format,
+                rotate_bytes=int(options.rotate_mb * 1024 * 1024) if options.rotate_mb else None,
+                rotate_seconds=options.rotate_minutes * 60 if options.rotate_minutes else None,
+            )
+        except (ImportError, ValueError) as e:
+            print(f"Export failed: {e}")
+            return
+        # Start from the oldest detection still in memory, then follow new ones
+        self.export_cursor = 0
+        self.export_job = None
+        self.export_btn.config(text="Zastavit export")
+        print(f"Exporting detections to {options.export_dir} as {options.export_format}")
+        self.flush_export()
+
+    def flush_export(self):
+        # Only the rows added since the previous flush are copied and handed over
+        self.exporter.submit(self.detection_results.columns(since=self.export_cursor))
+        self.export_cursor = self.detection_results.total
+        if self.exporter.error is not None:
+            print(f"Export failed: {self.exporter.error}")
+            self.stop_export()
+            return
+        self.export_job = self.root.after(1000, self.flush_export)
+
+    def stop_export(self, wait=False):
+        if self.export_job is not None:
+            self.root.after_cancel(self.export_job)
+        self.exporter.submit(self.detection_results.columns(since=self.export_cursor))
+        self.exporter.close(wait=wait)
+        self.exporter = None
+        self.export_btn.config(text=f"Exportovat do {self.options.export_format.upper()}")
+        print("Export stopped.")
+
+    def on_close(self):
+        # The exporter, video writer and snapshot pool write from background
+        # threads; they are finished here so closing the window never leaves a
+        # half-written file (a Parquet file without its footer is unreadable)
+        if self.camera_active:
+            self.stop_camera()
+        if self.exporter is not None:
+            self.stop_export(wait=True)
+        if self.options.analytics_file:
+            self.save_analytics(reschedule=False)
+        self.snapshots.close()
+        self.commands.shutdown()
+        sys.stdout = sys.__stdout__
+        self.log.close()
+        self.root.destroy()
 
     def on_button_press(self, event):
-        
         self.x1, self.y1 = event.x, event.y
 
     def on_mouse_drag(self, event):
-        
         self.x2, self.y2 = event.x, event.y
         self.canvas.delete("rect")
         self.canvas.create_rectangle(self.x1, self.y1, self.x2, self.y2, outline="red", tags="rect")
 
     def on_button_release(self, event):
-        
         self.x2, self.y2 = event.x, event.y
-        self.canvas.create_rectangle(self.x1, self.y1, self.x2, self.y2, outline="red")
+        self.canvas.delete("rect")
+        if abs(self.x2 - self.x1) < 5 or abs(self.y2 - self.y1) < 5:
+            # A plain click goes back to the whole frame
+            self.select_roi(WHOLE_FRAME)
+            return
+        if self.frame_view.frame_size is None:
+            return
+        x1, y1 = self.frame_view.canvas_to_frame(self.x1, self.y1)
+        x2, y2 = self.frame_view.canvas_to_frame(self.x2, self.y2)
+        roi = normalise(x1, y1, x2, y2, *self.frame_view.frame_size)
+        if min(roi_size(roi, *self.frame_view.frame_size)) < MIN_ROI_SIZE:
+            # A drag over the letterbox border clamps to a sliver at the frame edge
+            print("The region is outside the image or too small, using the whole frame.")
+            self.select_roi(WHOLE_FRAME)
+            return
+        self.roi = roi
+        self.roi_var.set(CUSTOM_ROI)
+        # Live frames draw the ROI themselves, stills keep the canvas rectangle
+        if not self.camera_active:
+            self.canvas.create_rectangle(self.x1, self.y1, self.x2, self.y2, outline="red", tags="rect")
 
+    def select_roi(self, name):
+        self.roi_var.set(name)
+        self.roi = self.rois.get(name)
+        self.canvas.delete("rect")
 
-root = tk.Tk()
-app = ObjectDetectionApp(root)
-root.mainloop()
+    def save_roi(self):
+        if self.roi is None:
+            print("Draw a region on the image first.")
+            return
+        name = simpledialog.askstring("ROI", "Název oblasti:", parent=self.root)
+        if name:
+            self.rois[name] = self.roi
+            save_rois(self.options.roi_file, self.rois)
+            self.refresh_roi_menu()
+            self.roi_var.set(name)
+            print(f"ROI '{name}' saved to {self.options.roi_file}")
+
+    def refresh_roi_menu(self):
+        menu = self.roi_menu["menu"]
+        menu.delete(0, "end")
+        for name in [WHOLE_FRAME] + sorted(self.rois):
+            menu.add_command(label=name, command=lambda name=name: self.select_roi(name))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Rozpoznávání objektů")
+    parser.add_argument("--config", help="JSON file with default values for any of these options")
+    parser.add_argument("--model", default=MODEL_PATH, help="YOLO weights (.pt) or an already exported model")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch", help="inference runtime")
+    parser.add_argument("--imgsz", type=int, default=640, help="model input size")
+    parser.add_argument("--int8", action="store_true", help="quantise the exported model to INT8 (onnx, openvino)")
+    parser.add_argument("--half", action="store_true", help="export the model in FP16 where the backend supports it")
+    parser.add_argument("--batch", metavar="SOURCE", help="headless detection over a directory or glob of images")
+    parser.add_argument("--output", default="batch_results.csv", help="CSV file for --batch results")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2, help="image decoding threads for --batch")
+    parser.add_argument("--no-threads", action="store_true", help="run capture, inference and rendering in the Tk loop")
+    parser.add_argument("--video", metavar="PATH", help="analyse a video file instead of the camera")
+    parser.add_argument("--stride", type=int, default=1, help="run detection on every Nth video frame")
+    parser.add_argument("--start", type=float, default=0.0, help="video start position in seconds")
+    parser.add_argument("--end", type=float, default=None, help="video end position in seconds")
+    parser.add_argument("--fast", action="store_true", help="process video as fast as possible instead of in real time")
+    parser.add_argument("--video-output", default="video_results.csv", help="CSV file the video detections are streamed to")
+    parser.add_argument("--motion-gate", action="store_true", help="skip the model while the scene does not change")
+    parser.add_argument("--motion-method", choices=("diff", "mog2"), default="diff")
+    parser.add_argument("--motion-threshold", type=int, default=25, help="per-pixel grey level change that counts as motion")
+    parser.add_argument("--motion-area", type=float, default=0.005, help="fraction of changed pixels that triggers inference")
+    parser.add_argument("--heartbeat", type=float, default=2.0, help="run the model at least this often in seconds")
+    parser.add_argument("--track", action="store_true", help="track objects and log each one once instead of every frame")
+    parser.add_argument("--detect-every", type=int, default=1, help="with --track, run the detector only every Nth frame")
+    parser.add_argument("--track-iou", type=float, default=0.3, help="minimum IoU to match a detection to a track")
+    parser.add_argument("--track-max-misses", type=int, default=10, help="detector runs a track may go unmatched")
+    parser.add_argument("--roi", help="name of a saved region of interest to run detection in")
+    parser.add_argument("--roi-file", default="rois.json", help="where named regions of interest are stored")
+    parser.add_argument("--tiles", action="store_true", help="detect stills tile by tile (for high-resolution photos)")
+    parser.add_argument("--tile-size", type=int, help="tile size in pixels (default: --imgsz)")
+    parser.add_argument("--tile-overlap", type=float, default=0.2, help="overlap between neighbouring tiles (0-1)")
+    parser.add_argument("--tile-batch", type=int, default=4, help="tiles sent to the model in one call")
+    parser.add_argument("--sources", nargs="+", metavar="SOURCE",
+                        help="camera indices and/or video files to detect on together with one batched model")
+    parser.add_argument("--target-fps", type=float, help="adapt input size, frame skip and camera resolution to hold this frame rate")
+    parser.add_argument("--max-temp", type=float, default=75.0, help="SoC temperature (°C) above which quality is lowered")
+    parser.add_argument("--max-cpu", type=float, default=0.9, help="CPU load (0-1) above which quality is lowered")
+    parser.add_argument("--overlay", action="store_true", help="show FPS and stage latencies over the video")
+    parser.add_argument("--metrics-port", type=int, help="serve metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-file", help="write metrics to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=5.0, help="seconds between metrics file writes")
+    parser.add_argument("--log-level", choices=LEVELS, default="detection",
+                        help="lowest level shown in the console (info hides the per-detection lines)")
+    parser.add_argument("--log-lines", type=int, default=1000, help="lines kept in the console widget")
+    parser.add_argument("--log-file", help="also write the console to this rotating log file")
+    parser.add_argument("--log-max-mb", type=float, default=5.0, help="size at which the log file is rotated")
+    parser.add_argument("--max-commands", type=int, default=2, help="console commands allowed to run at the same time")
+    parser.add_argument("--still-cache", type=int, default=256, help="detected still images kept in the result cache")
+    parser.add_argument("--analytics-file", help="keep per-class statistics and the heatmap in this .npz across restarts")
+    parser.add_argument("--snapshot-dir", default="snapshots", help="directory for captured images and event clips")
+    parser.add_argument("--snapshot-format", choices=SNAPSHOT_FORMATS, default="jpg")
+    parser.add_argument("--snapshot-quality", type=int, default=90, help="JPEG/WebP quality (0-100)")
+    parser.add_argument("--png-compression", type=int, default=3, help="PNG compression level (0-9)")
+    parser.add_argument("--clip-classes", nargs="+", metavar="CLASS", help="save a clip whenever one of these classes appears")
+    parser.add_argument("--clip-pre", type=float, default=3.0, help="seconds of video kept before the event")
+    parser.add_argument("--clip-post", type=float, default=3.0, help="seconds of video recorded after the event")
+    parser.add_argument("--clip-cooldown", type=float, default=10.0, help="seconds between two event clips")
+    parser.add_argument("--inference-workers", type=int, default=0, help="run inference in N separate processes (0 = in this process)")
+    parser.add_argument("--server", metavar="HOST:PORT", help="use the model of a running server.py instead of loading one")
+    parser.add_argument("--max-detections", type=int, default=100000, help="detections kept in memory")
+    parser.add_argument("--export-format", choices=FORMATS, default="csv")
+    parser.add_argument("--export-dir", default="exports", help="directory for exported detection files")
+    parser.add_argument("--rotate-mb", type=float, default=50, help="start a new export file after this many MB (0 = never)")
+    parser.add_argument("--rotate-minutes", type=float, default=60, help="start a new export file after this many minutes (0 = never)")
+    parser.add_argument("--chart-window", type=int, default=300, help="number of recent detections shown in the chart")
+    parser.add_argument("--chart-fps", type=float, default=4, help="maximum chart refreshes per second")
+    return parser
+
+
+def parse_options(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.config:
+        # Values from the config file become defaults, explicit arguments still win
+        with open(args.config, encoding="utf-8") as f:
+            parser.set_defaults(**json.load(f))
+        args = parser.parse_args(argv)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_options()
+
+    if args.batch:
+        run_batch_detection(create_model(args), args.batch, args.output, args.batch_size, args.workers)
+    else:
+        root = tk.Tk()
+        app = ObjectDetectionApp(root, args)
+        root.mainloop()
@@ -0,0 +1,232 @@
+import atexit
+import itertools
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class HostArray:
+    # Stands in for the tensor in ultralytics' Boxes.data; the data is already on the host
+    __slots__ = ("array",)
+
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class ArrayBoxes:
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = HostArray(data)
+
+
+class ArrayResult:
+    # The part of an ultralytics Results object the app reads (result.boxes.data),
+    # so code written for the in-process model works unchanged
+    __slots__ = ("boxes",)
+
+    def __init__(self, data):
+        self.boxes = ArrayBoxes(data)
+
+
+EMPTY = np.zeros((0, 6), dtype=np.float32)
+
+
+def _worker_main(memory_name, offset, model_args, requests, results):
+    # Runs in the worker process: loads its own model, then runs each batch of frames
+    # from its shared-memory slot (and the pickled ones that did not fit) in one call
+    from multiprocessing import shared_memory
+
+    from backends import load_detector
+
+    try:
+        model = load_detector(*model_args)
+        model(np.zeros((model_args[2], model_args[2], 3), dtype=np.uint8), verbose=False)
+    except Exception as e:
+        results.put(("error", None, repr(e)))
+        return
+    memory = shared_memory.SharedMemory(name=memory_name)
+    results.put(("ready", None, dict(model.names)))
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            job, layout, imgsz, pickled = request
+            pickled = iter(pickled)
+            frames = [next(pickled) if start is None else
+                      np.ndarray(shape, dtype, buffer=memory.buf, offset=offset + start)
+                      for shape, dtype, start in layout]
+            try:
+                kwargs = {} if imgsz is None else {"imgsz": imgsz}
+                data = [np.ascontiguousarray(result.boxes.data.cpu().numpy(), dtype=np.float32)
+                        for result in model(frames, verbose=False, **kwargs)]
+                results.put(("result", job, data))
+            except Exception as e:
+                results.put(("error", job, repr(e)))
+            # Drop the views before the next request, and before closing the segment
+            frames = None
+    finally:
+        memory.close()
+
+
+class Worker:
+    __slots__ = ("process", "requests", "results")
+
+    def __init__(self, process, requests, results):
+        self.process = process
+        self.requests = requests
+        self.results = results
+
+
+class InferenceWorkerPool:
+    # Runs the detector in separate processes so inference does not share the
+    # GIL with Tk, matplotlib and the capture thread. Each worker owns one slot
+    # of a shared-memory segment: frames are copied into the slot once and only
+    # their shapes travel through the queue; the reply is one (N, 6) box array
+    # per frame. Frames that do not fit in the slot (big stills) are pickled
+    # instead. A worker that dies is restarted on the next call; the frames it
+    # was working on come back without detections.
+    # Calling the pool works like calling the ultralytics model. A list is cut
+    # into one chunk per worker and every chunk is a single batched call.
+    def __init__(self, weights, backend="pytorch", imgsz=640, int8=False, half=False, workers=1,
+                 slot_bytes=8 * 640 * 480 * 3, start_timeout=600):
+        # Needs Python 3.8+, imported here so the in-process mode works without it
+        from multiprocessing import shared_memory
+
+        # Forking a process that runs Tk and several threads is unsafe, always spawn
+        self.context = multiprocessing.get_context("spawn")
+        self.model_args = (weights, backend, imgsz, int8, half)
+        self.slot_bytes = slot_bytes
+        self.start_timeout = start_timeout
+        self.memory = shared_memory.SharedMemory(create=True, size=slot_bytes * workers)
+        self.workers = [None] * workers
+        self.idle = queue.Queue()
+        self.job_ids = itertools.count()
+        self.restart_lock = threading.Lock()
+        self.restarts = 0
+        self.names = None
+        self.closed = False
+        atexit.register(self.close)
+        try:
+            for i in range(workers):
+                self._start(i)
+                self.idle.put(i)
+        except Exception:
+            self.close()
+            raise
+        self.dispatch = ThreadPoolExecutor(workers, thread_name_prefix="dispatch")
+
+    def _start(self, i):
+        requests = self.context.Queue()
+        results = self.context.Queue()
+        process = self.context.Process(
+            target=_worker_main, args=(self.memory.name, i * self.slot_bytes, self.model_args, requests, results),
+            name=f"inference-{i}", daemon=True
+        )
+        process.start()
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            try:
+                kind, _, payload = results.get(timeout=0.5)
+                break
+            except queue.Empty:
+                # A worker that dies while importing or loading never answers
+                if not process.is_alive():
+                    raise RuntimeError(f"Inference worker exited with code {process.exitcode} while starting")
+                if time.monotonic() > deadline:
+                    process.terminate()
+                    raise RuntimeError("Inference worker did not start in time")
+        if kind != "ready":
+            raise RuntimeError(f"Inference worker failed to start: {payload}")
+        self.names = payload
+        self.workers[i] = Worker(process, requests, results)
+
+    def _restart(self, i):
+        with self.restart_lock:
+            worker = self.workers[i]
+            if worker.process.is_alive():
+                return
+            print(f"Inference worker {i} exited with code {worker.process.exitcode}, restarting it")
+            self.restarts += 1
+            self._start(i)
+
+    def run(self, frames, imgsz=None):
+        # Thread-safe; blocks until a worker is free and has processed the batch
+        i = self.idle.get()
+        try:
+            return self._run_on(i, frames, imgsz)
+        finally:
+            self.idle.put(i)
+
+    def _run_on(self, i, frames, imgsz):
+        if not self.workers[i].process.is_alive():
+            self._restart(i)
+        worker = self.workers[i]
+        job = next(self.job_ids)
+        layout = []
+        pickled = []
+        used = 0
+        for frame in frames:
+            frame = np.ascontiguousarray(frame)
+            if used + frame.nbytes <= self.slot_bytes:
+                slot = np.ndarray(frame.shape, frame.dtype, buffer=self.memory.buf, offset=i * self.slot_bytes + used)
+                slot[...] = frame
+                del slot
+                layout.append((frame.shape, frame.dtype.str, used))
+                used += frame.nbytes
+            else:
+                layout.append((frame.shape, frame.dtype.str, None))
+                pickled.append(frame)
+        worker.requests.put((job, layout, imgsz, pickled))
+
+        while True:
+            try:
+                kind, job_id, payload = worker.results.get(timeout=0.5)
+            except queue.Empty:
+                if worker.process.is_alive():
+                    continue
+                self._restart(i)
+                return [EMPTY] * len(frames)
+            if job_id != job:
+                # Reply to a frame whose caller already gave up
+                continue
+            if kind == "error":
+                raise RuntimeError(f"Inference worker {i}: {payload}")
+            return payload
+
+    def __call__(self, source, verbose=False, imgsz=None, **kwargs):
+        if not isinstance(source, list):
+            data = self.run([source], imgsz)
+        elif len(self.workers) == 1 or len(source) < 2:
+            data = self.run(source, imgsz)
+        else:
+            size = -(-len(source) // len(self.workers))
+            chunks = [source[start:start + size] for start in range(0, len(source), size)]
+            data = [boxes for part in self.dispatch.map(lambda chunk: self.run(chunk, imgsz), chunks) for boxes in part]
+        return [ArrayResult(boxes) for boxes in data]
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for worker in self.workers:
+            if worker is not None and worker.process.is_alive():
+                worker.requests.put(None)
+        for worker in self.workers:
+            if worker is not None:
+                worker.process.join(2.0)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+        self.memory.close()
+        self.memory.unlink()
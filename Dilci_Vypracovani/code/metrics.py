@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Upper bucket bounds in seconds, shared by all stage histograms
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class StageHistogram:
+    # Latency of one stage: the last `window` samples for rolling percentiles
+    # plus cumulative bucket counts, sum and count for the text endpoint.
+    def __init__(self, window=500):
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.window = window
+        self.buckets = np.zeros(len(BUCKETS), dtype=np.int64)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.samples[self.count % self.window] = seconds
+        self.count += 1
+        self.sum += seconds
+        self.buckets[np.searchsorted(BUCKETS, seconds):] += 1
+
+    def recent(self):
+        return self.samples[:min(self.count, self.window)]
+
+    def percentile(self, p):
+        recent = self.recent()
+        return float(np.percentile(recent, p)) if len(recent) else None
+
+
+class Metrics:
+    # Thread-safe collection of stage latencies, counters and gauges. Pipeline
+    # workers and the Tk thread write into it, the endpoint and overlay read.
+    def __init__(self, window=500):
+        self.window = window
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.counters = {}
+        self.gauges = {}
+        self.class_counts = {}
+        self.names = {}
+        self.frame_times = np.zeros(60, dtype=np.float64)
+        self.frames = 0
+        self.started = time.time()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = StageHistogram(self.window)
+            histogram.observe(seconds)
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def count_detections(self, detections):
+        if detections is None or not len(detections):
+            return
+        classes, counts = np.unique(detections.cls, return_counts=True)
+        with self.lock:
+            for cls, n in zip(classes.tolist(), counts.tolist()):
+                self.class_counts[cls] = self.class_counts.get(cls, 0) + n
+
+    def frame_shown(self):
+        with self.lock:
+            self.frame_times[self.frames % len(self.frame_times)] = time.perf_counter()
+            self.frames += 1
+
+    def fps(self):
+        with self.lock:
+            n = min(self.frames, len(self.frame_times))
+            if n < 2:
+                return 0.0
+            newest = self.frame_times[(self.frames - 1) % len(self.frame_times)]
+            oldest = self.frame_times[(self.frames - n) % len(self.frame_times)]
+        return (n - 1) / (newest - oldest) if newest > oldest else 0.0
+
+    def overlay_text(self):
+        parts = [f"{self.fps():.1f} FPS"]
+        with self.lock:
+            for stage in ("capture", "inference", "render", "display"):
+                histogram = self.stages.get(stage)
+                if histogram is not None and histogram.count:
+                    parts.append(f"{stage} {1000 * histogram.percentile(50):.0f}/"
+                                 f"{1000 * histogram.percentile(95):.0f} ms")
+            dropped = self.gauges.get("dropped_frames")
+        if dropped:
+            parts.append(f"dropped {dropped}")
+        return " | ".join(parts)
+
+    def render_text(self):
+        # Prometheus text exposition format, readable by most local scrapers
+        lines = [
+            "# TYPE detector_uptime_seconds gauge",
+            f"detector_uptime_seconds {time.time() - self.started:.1f}",
+            "# TYPE detector_fps gauge",
+            f"detector_fps {self.fps():.2f}",
+        ]
+        with self.lock:
+            lines.append("# TYPE detector_stage_seconds histogram")
+            for stage, histogram in sorted(self.stages.items()):
+                for bound, count in zip(BUCKETS, histogram.buckets.tolist()):
+                    lines.append(f'detector_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'detector_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'detector_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'detector_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+            lines.append("# TYPE detector_stage_p95_seconds gauge")
+            for stage, histogram in sorted(self.stages.items()):
+                if histogram.count:
+                    lines.append(f'detector_stage_p95_seconds{{stage="{stage}"}} {histogram.percentile(95):.6f}')
+            lines.append("# TYPE detector_detections_total counter")
+            for cls, count in sorted(self.class_counts.items()):
+                name = self.names.get(cls, str(cls))
+                lines.append(f'detector_detections_total{{class="{name}"}} {count}')
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE detector_{name}_total counter")
+                lines.append(f"detector_{name}_total {value}")
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f"# TYPE detector_{name} gauge")
+                lines.append(f"detector_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Replaced atomically so a scraper never reads a half-written file
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            f.write(self.render_text())
+        os.replace(temporary, path)
+
+
+class MetricsServer:
+    # Serves Metrics.render_text() on http://host:port/metrics from a daemon thread
+    def __init__(self, metrics, port=9100, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
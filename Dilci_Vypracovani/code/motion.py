@@ -0,0 +1,51 @@
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    # Decides whether a frame is worth a forward pass. Works on a small blurred
+    # grayscale copy: either the difference to the frame the model last saw
+    # ("diff") or an adaptive MOG2 background model ("mog2"). A heartbeat forces
+    # inference every few seconds so slow changes are not missed forever.
+    def __init__(self, method="diff", threshold=25, min_changed=0.005, heartbeat=2.0, width=160):
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Unknown motion method {method}")
+        self.method = method
+        self.threshold = threshold
+        self.min_changed = min_changed
+        self.heartbeat = heartbeat
+        self.width = width
+        self.reference = None
+        self.last_inference = 0.0
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=False) if method == "mog2" else None
+        self.checked = 0
+        self.skipped = 0
+
+    def _prepare(self, frame):
+        height = max(1, frame.shape[0] * self.width // frame.shape[1])
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def changed_fraction(self, gray):
+        if self.subtractor is not None:
+            mask = self.subtractor.apply(gray)
+            return np.count_nonzero(mask) / mask.size
+        if self.reference is None or self.reference.shape != gray.shape:
+            return 1.0
+        diff = cv2.absdiff(gray, self.reference)
+        return np.count_nonzero(diff > self.threshold) / diff.size
+
+    def should_infer(self, frame):
+        self.checked += 1
+        gray = self._prepare(frame)
+        now = time.monotonic()
+        changed = self.changed_fraction(gray)
+        if changed >= self.min_changed or now - self.last_inference >= self.heartbeat:
+            self.reference = gray
+            self.last_inference = now
+            return True
+        self.skipped += 1
+        return False
@@ -0,0 +1,142 @@
+import collections
+import threading
+import time
+import tkinter as tk
+
+import cv2
+
+from frame_view import FrameView
+from pipeline import FramePacket, LatestQueue
+from video_source import VideoFileSource
+
+
+def open_source(spec, width=640, height=480):
+    # A number is a camera device index, anything else a video file
+    if spec.isdigit():
+        capture = cv2.VideoCapture(int(spec))
+        if not capture.isOpened():
+            raise IOError(f"Cannot open camera {spec}")
+        capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        return capture
+    # Files play at their own frame rate, like a camera would deliver them
+    return VideoFileSource(spec, realtime=True)
+
+
+class MultiStreamPipeline:
+    # One capture thread per source and a single inference thread. Every tick
+    # the inference thread takes the newest frame of each stream that has one
+    # and runs them through the model as one batch, so N cameras share one
+    # model and one forward pass instead of N processes with N model copies.
+    # infer_batch gets a list of frames and returns one Detections per frame;
+    # rendered packets end up in the stream's own queue for the Tk thread.
+    def __init__(self, sources, infer_batch, render, idle_wait=0.005):
+        self.sources = sources
+        self.infer_batch = infer_batch
+        self.render = render
+        self.idle_wait = idle_wait
+        self.stop_event = threading.Event()
+        self.frames = [LatestQueue(1) for _ in sources]
+        self.rendered = [LatestQueue(1) for _ in sources]
+        # Detections of every inferred frame, drained by the Tk thread (see DetectionPipeline)
+        self.recorded = [collections.deque() for _ in sources]
+        self.finished = [False] * len(sources)
+        self.threads = []
+        self.error = None
+        self.batches = 0
+        self.batched_frames = 0
+
+    @property
+    def dropped_frames(self):
+        return sum(frames.dropped for frames in self.frames)
+
+    @property
+    def done(self):
+        return all(self.finished) and not any(thread.is_alive() for thread in self.threads)
+
+    def start(self):
+        self.stop_event.clear()
+        self.threads = [
+            threading.Thread(target=self._capture_loop, args=(stream,), name=f"capture-{stream}", daemon=True)
+            for stream in range(len(self.sources))
+        ]
+        self.threads.append(threading.Thread(target=self._inference_loop, name="inference", daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def latest(self, stream):
+        return self.rendered[stream].get_latest()
+
+    def new_detections(self, stream):
+        found = []
+        while self.recorded[stream]:
+            found.append(self.recorded[stream].popleft())
+        return found
+
+    def _capture_loop(self, stream):
+        source = self.sources[stream]
+        index = 0
+        try:
+            while not self.stop_event.is_set():
+                ret, frame = source.read()
+                if not ret:
+                    break
+                self.frames[stream].put(FramePacket(index, frame, getattr(source, "last_position", None)))
+                index += 1
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+        finally:
+            self.finished[stream] = True
+
+    def _gather(self):
+        batch = []
+        for stream, frames in enumerate(self.frames):
+            packet = frames.get_latest()
+            if packet is not None:
+                batch.append((stream, packet))
+        return batch
+
+    def _inference_loop(self):
+        try:
+            while not self.stop_event.is_set():
+                # Read before gathering, so a frame put right before finishing is not lost
+                finished = all(self.finished)
+                batch = self._gather()
+                if not batch:
+                    if finished:
+                        return
+                    time.sleep(self.idle_wait)
+                    continue
+                detections = self.infer_batch([packet.frame for _, packet in batch])
+                self.batches += 1
+                self.batched_frames += len(batch)
+                for (stream, packet), frame_detections in zip(batch, detections):
+                    packet.detections = packet.results = frame_detections
+                    if len(frame_detections):
+                        self.recorded[stream].append((frame_detections, packet.index, packet.timestamp,
+                                                      packet.frame.shape))
+                    packet.annotated = self.render(packet.frame, frame_detections)
+                    self.rendered[stream].put(packet)
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+
+
+class StreamWindow:
+    # Extra top-level window with its own canvas for one additional stream
+    def __init__(self, master, title, width=640, height=480):
+        self.window = tk.Toplevel(master)
+        self.window.title(title)
+        self.canvas = tk.Canvas(self.window, width=width, height=height, bg="black", highlightthickness=0)
+        self.canvas.pack(fill="both", expand=True)
+        self.view = FrameView(self.canvas)
+
+    def destroy(self):
+        self.window.destroy()
@@ -0,0 +1,274 @@
+import collections
+import queue
+import threading
+import time
+
+
+class LatestQueue:
+    # Bounded queue that never blocks the producer: when it is full the oldest
+    # item is thrown away, so the consumer always gets the freshest frame.
+    # With drop_oldest=False it blocks instead, for offline sources where every
+    # frame has to be processed.
+    def __init__(self, maxsize=1, drop_oldest=True, stop_event=None):
+        self.queue = queue.Queue(maxsize)
+        self.drop_oldest = drop_oldest
+        self.stop_event = stop_event
+        self.dropped = 0
+        # Set by the producing stage once it will not put anything more
+        self.closed = False
+
+    def put(self, item):
+        if not self.drop_oldest:
+            while not (self.stop_event and self.stop_event.is_set()):
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def get_latest(self):
+        item = None
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return item
+
+    def clear(self):
+        self.get_latest()
+        self.closed = False
+
+
+class FramePacket:
+    __slots__ = ("index", "position", "timestamp", "frame", "results", "reused", "annotated", "detections")
+
+    def __init__(self, index, frame, position=None):
+        self.index = index
+        # Frame number within the source; differs from index when frames are skipped
+        self.position = index if position is None else position
+        self.timestamp = time.time()
+        self.frame = frame
+        # What gets drawn: detector output, or tracked boxes between detector runs
+        self.results = None
+        # True when the model did not run for this frame (motion gate, tracker)
+        self.reused = False
+        self.annotated = None
+        # What gets logged: new detections, or only newly started tracks when tracking
+        self.detections = None
+
+
+class DetectionPipeline:
+    # capture -> inference -> render, each stage on its own thread, joined by
+    # LatestQueues so a slow stage drops stale frames instead of building a backlog.
+    # With threaded=False the same stages run inline from step().
+    # source is anything with a cv2.VideoCapture-like read(); sink, if given, is
+    # called with every rendered packet on the render worker. lossless=True makes
+    # the capture and inference queues block instead of dropping frames.
+    # gate, if given, is asked before every forward pass and may reuse the last results.
+    # tracker, if given, carries boxes between detector runs, which then only happen
+    # every detect_every frames or when the tracker asks for one.
+    # controller, if given, is told every forward pass time and sets the frame
+    # skip and the camera resolution (see adaptive.QualityController).
+    # metrics, if given, gets the time of every stage and the detections per class.
+    def __init__(self, source, infer, render, threaded=True, queue_size=1, sink=None, lossless=False, gate=None,
+                 tracker=None, detect_every=1, controller=None, metrics=None):
+        self.source = source
+        self.infer = infer
+        self.render = render
+        self.sink = sink
+        self.gate = gate
+        self.tracker = tracker
+        self.detect_every = detect_every
+        self.controller = controller
+        self.metrics = metrics
+        self.since_detection = None
+        self.last_results = None
+        self.threaded = threaded
+
+        self.stop_event = threading.Event()
+        self.frames = LatestQueue(queue_size, not lossless, self.stop_event)
+        self.inferred = LatestQueue(queue_size, not lossless, self.stop_event)
+        # The Tk thread only ever shows the newest frame, so this one always drops
+        self.rendered = LatestQueue(queue_size)
+        # What every forward pass found, kept apart from the frames so none is
+        # lost when the shown frame is replaced before the Tk thread polls
+        self.recorded = collections.deque()
+
+        self.threads = []
+        self.frame_index = 0
+        self.finished = False
+        self.error = None
+
+    @property
+    def dropped_frames(self):
+        return self.frames.dropped + self.inferred.dropped + self.rendered.dropped
+
+    def start(self):
+        self.stop_event.clear()
+        self.finished = False
+        self.error = None
+        if not self.threaded:
+            return
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+            threading.Thread(target=self._render_loop, name="render", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self.threads = []
+        for stage_queue in (self.frames, self.inferred, self.rendered):
+            stage_queue.clear()
+
+    @property
+    def done(self):
+        # True once the source is exhausted and every queued frame went through all stages
+        return self.finished and not any(thread.is_alive() for thread in self.threads)
+
+    def latest(self):
+        # Called from the Tk thread: newest rendered packet, or None if nothing new.
+        return self.rendered.get_latest()
+
+    def new_detections(self):
+        # Called from the Tk thread: (detections, frame index, timestamp, frame shape)
+        # of every forward pass since the previous call that found something
+        found = []
+        while self.recorded:
+            found.append(self.recorded.popleft())
+        return found
+
+    def step(self):
+        packet = self._capture()
+        if packet is None:
+            return None
+        self._infer(packet)
+        self._render(packet)
+        return packet
+
+    def _capture(self):
+        if self.controller is not None:
+            self.controller.apply_capture(self.source)
+        start = time.perf_counter()
+        ret, frame = self.source.read()
+        if self.metrics is not None:
+            self.metrics.observe("capture", time.perf_counter() - start)
+        if not ret:
+            self.finished = True
+            return None
+        packet = FramePacket(self.frame_index, frame, getattr(self.source, "last_position", None))
+        self.frame_index += 1
+        return packet
+
+    def _detector_due(self):
+        tracker = self.tracker
+        if self.since_detection is None:
+            return True
+        if self.controller is not None and self.since_detection + 1 < self.controller.frame_skip:
+            return False
+        if tracker is None:
+            return True
+        return self.since_detection + 1 >= self.detect_every or tracker.needs_detection()
+
+    def _infer(self, packet):
+        due = self._detector_due()
+        if due and self.gate is not None and self.last_results is not None:
+            due = self.gate.should_infer(packet.frame)
+        if not due:
+            packet.reused = True
+            packet.results = self.tracker.predict() if self.tracker is not None else self.last_results
+            self.since_detection += 1
+            if self.controller is not None:
+                self.controller.record()
+            if self.metrics is not None:
+                self.metrics.count("reused_frames")
+            return
+
+        start = time.perf_counter()
+        detections = self.infer(packet.frame)
+        elapsed = time.perf_counter() - start
+        if self.controller is not None:
+            self.controller.record(elapsed)
+        if self.metrics is not None:
+            self.metrics.observe("inference", elapsed)
+        self.since_detection = 0
+        if self.tracker is not None:
+            packet.detections = self.tracker.update(detections)
+            packet.results = self.tracker.detections()
+        else:
+            packet.detections = packet.results = detections
+        self.last_results = packet.results
+        if len(packet.detections):
+            self.recorded.append((packet.detections, packet.index, packet.timestamp, packet.frame.shape))
+        if self.metrics is not None:
+            self.metrics.count_detections(packet.detections)
+
+    def _render(self, packet):
+        start = time.perf_counter()
+        packet.annotated = self.render(packet.frame, packet.results)
+        if self.metrics is not None:
+            self.metrics.observe("render", time.perf_counter() - start)
+        if self.sink is not None:
+            self.sink(packet)
+
+    def _capture_loop(self):
+        self._run_stage(None, self.frames, lambda _: self._capture())
+
+    def _inference_loop(self):
+        self._run_stage(self.frames, self.inferred, self._infer_stage)
+
+    def _render_loop(self):
+        self._run_stage(self.inferred, self.rendered, self._render_stage)
+
+    def _infer_stage(self, packet):
+        self._infer(packet)
+        return packet
+
+    def _render_stage(self, packet):
+        self._render(packet)
+        return packet
+
+    def _run_stage(self, source, target, work):
+        try:
+            while not self.stop_event.is_set():
+                if source is None:
+                    item = None
+                else:
+                    try:
+                        item = source.get(timeout=0.1)
+                    except queue.Empty:
+                        if not source.closed:
+                            continue
+                        # The producer may have put its last item right before closing
+                        try:
+                            item = source.queue.get_nowait()
+                        except queue.Empty:
+                            return
+                packet = work(item)
+                if packet is None:
+                    return
+                target.put(packet)
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+        finally:
+            target.closed = True
@@ -0,0 +1,49 @@
+import json
+import os
+
+import numpy as np
+
+# ROIs are stored normalised to 0..1 so they survive a change of capture resolution
+
+# Smallest drawn region, in frame pixels, accepted as an ROI
+MIN_ROI_SIZE = 8
+
+
+def load_rois(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {name: tuple(roi) for name, roi in json.load(f).items()}
+
+
+def save_rois(path, rois):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({name: list(roi) for name, roi in rois.items()}, f, indent=2)
+
+
+def normalise(x1, y1, x2, y2, width, height):
+    x1, x2 = sorted((min(max(x1 / width, 0.0), 1.0), min(max(x2 / width, 0.0), 1.0)))
+    y1, y2 = sorted((min(max(y1 / height, 0.0), 1.0), min(max(y2 / height, 0.0), 1.0)))
+    return x1, y1, x2, y2
+
+
+def roi_size(roi, width, height):
+    return (roi[2] - roi[0]) * width, (roi[3] - roi[1]) * height
+
+
+def roi_pixels(roi, width, height):
+    # Always at least one pixel inside the frame, so the crop is never empty
+    x1, y1 = min(int(roi[0] * width), width - 1), min(int(roi[1] * height), height - 1)
+    x2, y2 = max(int(roi[2] * width), x1 + 1), max(int(roi[3] * height), y1 + 1)
+    return x1, y1, x2, y2
+
+
+def detect_in_roi(detect, frame, roi):
+    # Runs detect on the ROI crop only and shifts the boxes back to frame coordinates
+    if roi is None:
+        return detect(frame)
+    x1, y1, x2, y2 = roi_pixels(roi, frame.shape[1], frame.shape[0])
+    detections = detect(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+    if len(detections):
+        detections.boxes += np.array([x1, y1, x1, y1], dtype=np.float32)
+    return detections
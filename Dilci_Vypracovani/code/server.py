@@ -0,0 +1,243 @@
+import argparse
+import http.client
+import json
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, load_detector
+from engine import DetectionEngine
+from inference_workers import ArrayResult, InferenceWorkerPool
+
+# Body type of an undecoded frame; its shape goes in the X-Frame-Shape header ("height,width,channels")
+RAW_FRAME = "application/x-raw-frame"
+# Reply type of the binary format: the (N, 6) float32 array x1, y1, x2, y2, confidence, class, little endian
+RAW_BOXES = "application/octet-stream"
+# Largest request body accepted, a 4K raw frame is about 25 MB
+MAX_BODY = 64 * 1024 * 1024
+
+
+def boxes_to_json(boxes, names, shape):
+    return {
+        "width": shape[1],
+        "height": shape[0],
+        "detections": [
+            {"box": [round(float(v), 1) for v in row[:4]], "confidence": round(float(row[4]), 4),
+             "class": int(row[5]), "name": names.get(int(row[5]), str(int(row[5])))}
+            for row in boxes
+        ],
+    }
+
+
+class DetectionServer:
+    # Serves one DetectionEngine over HTTP from a daemon thread, so the kiosk
+    # GUI, a logger and the door controller share one loaded model:
+    #   GET  /info    class names and batching statistics (JSON)
+    #   POST /detect  body is an encoded image (JPEG, PNG, ...) or a raw frame
+    #                 (Content-Type application/x-raw-frame plus X-Frame-Shape);
+    #                 ?format=json (default) or binary, optional ?imgsz=
+    # Each connection is handled on its own thread and blocks on the engine,
+    # which batches requests from all of them.
+    def __init__(self, engine, port=8765, host="127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so a client streaming frames does not reconnect for each one, and no
+            # Nagle delay between the headers and the body of a reply
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def reply(self, code, content_type, body):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def reply_json(self, code, payload):
+                self.reply(code, "application/json", json.dumps(payload).encode())
+
+            def do_GET(self):
+                if urlsplit(self.path).path != "/info":
+                    self.reply_json(404, {"error": "not found"})
+                    return
+                self.reply_json(200, {
+                    "names": engine.names, "max_batch": engine.max_batch, "max_delay_ms": engine.max_delay * 1000,
+                    "batches": engine.batches, "mean_batch": round(engine.mean_batch, 2),
+                })
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                length = self.headers.get("Content-Length")
+                if length is None:
+                    # The body cannot be told apart from the next request on a keep-alive connection
+                    self.close_connection = True
+                    self.reply_json(411, {"error": "Content-Length is required"})
+                    return
+                try:
+                    length = int(length)
+                    if not 0 <= length <= MAX_BODY:
+                        raise ValueError
+                except ValueError:
+                    self.close_connection = True
+                    self.reply_json(400, {"error": f"Invalid Content-Length {length}"})
+                    return
+                body = self.rfile.read(length)
+                if url.path != "/detect":
+                    self.reply_json(404, {"error": "not found"})
+                    return
+                query = parse_qs(url.query)
+                try:
+                    frame = self.read_frame(body)
+                    imgsz = int(query["imgsz"][0]) if "imgsz" in query else None
+                except ValueError as e:
+                    self.reply_json(400, {"error": str(e)})
+                    return
+                try:
+                    boxes = engine.detect(frame, imgsz)
+                except Exception as e:
+                    self.reply_json(500, {"error": repr(e)})
+                    return
+                if query.get("format", ["json"])[0] == "binary":
+                    self.reply(200, RAW_BOXES, boxes.astype("<f4").tobytes())
+                else:
+                    self.reply_json(200, boxes_to_json(boxes, engine.names, frame.shape))
+
+            def read_frame(self, body):
+                if not body:
+                    raise ValueError("Request body is empty")
+                if self.headers.get("Content-Type") == RAW_FRAME:
+                    shape = tuple(int(v) for v in self.headers.get("X-Frame-Shape", "").split(","))
+                    if int(np.prod(shape)) != len(body):
+                        raise ValueError(f"Frame shape {shape} does not match {len(body)} bytes")
+                    return np.frombuffer(body, dtype=np.uint8).reshape(shape)
+                try:
+                    frame = cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_COLOR)
+                except cv2.error:
+                    frame = None
+                if frame is None:
+                    raise ValueError("Body is not a readable image")
+                return frame
+
+            def log_message(self, format, *args):
+                pass
+
+        self.engine = engine
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="detection-server", daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DetectionClient:
+    # Called like the ultralytics model, but the frames go to a running
+    # DetectionServer as raw bytes and come back as binary box arrays. Every
+    # calling thread keeps its own keep-alive connection; the frames of a list
+    # are sent in parallel so the server can put them in one batch.
+    def __init__(self, url, timeout=30.0, parallel=8):
+        if "://" not in url:
+            url = f"http://{url}"
+        address = urlsplit(url)
+        self.host = address.hostname or "127.0.0.1"
+        self.port = address.port or 8765
+        self.timeout = timeout
+        self.local = threading.local()
+        self.dispatch = ThreadPoolExecutor(parallel, thread_name_prefix="client")
+        self.names = {int(cls): name for cls, name in self._request("GET", "/info")[1]["names"].items()}
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            connection.connect()
+            # Headers and body go out as separate writes, Nagle would hold the body back for an ACK
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.local.connection = connection
+        return connection
+
+    def _request(self, method, path, body=None, headers=None):
+        # A keep-alive connection the server has dropped fails once, the retry reconnects
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body, headers or {})
+                response = connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    raise
+        if response.getheader("Content-Type") == "application/json":
+            data = json.loads(data)
+            if response.status != 200:
+                raise RuntimeError(f"Detection server: {data.get('error')}")
+        return response.status, data
+
+    def detect(self, frame, imgsz=None):
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        path = "/detect?format=binary" + (f"&imgsz={imgsz}" if imgsz else "")
+        headers = {"Content-Type": RAW_FRAME, "X-Frame-Shape": ",".join(map(str, frame.shape))}
+        _, data = self._request("POST", path, frame.data, headers)
+        return np.frombuffer(data, dtype="<f4").reshape(-1, 6)
+
+    def __call__(self, source, verbose=False, imgsz=None, **kwargs):
+        if isinstance(source, list):
+            data = list(self.dispatch.map(lambda frame: self.detect(frame, imgsz), source))
+        else:
+            data = [self.detect(source, imgsz)]
+        return [ArrayResult(boxes) for boxes in data]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Detection server shared by the local tools")
+    parser.add_argument("--model", default="yolov8n.pt", help="weights file")
+    parser.add_argument("--backend", choices=BACKENDS, default="pytorch")
+    parser.add_argument("--imgsz", type=int, default=640, help="model input size")
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--half", action="store_true")
+    parser.add_argument("--inference-workers", type=int, default=0, help="run inference in N separate processes (0 = in this process)")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on, keep it local")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=8, help="most frames in one forward pass")
+    parser.add_argument("--max-delay-ms", type=float, default=10.0, help="longest a request waits for a batch to fill")
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+    if options.inference_workers:
+        model = InferenceWorkerPool(options.model, options.backend, options.imgsz, options.int8, options.half,
+                                    options.inference_workers)
+    else:
+        model = load_detector(options.model, options.backend, options.imgsz, options.int8, options.half)
+    model(np.zeros((options.imgsz, options.imgsz, 3), dtype=np.uint8), verbose=False)
+    engine = DetectionEngine(model, options.max_batch, options.max_delay_ms / 1000)
+    server = DetectionServer(engine, options.port, options.host)
+    print(f"Serving {options.model} on {server.url}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import collections
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+FORMATS = ("jpg", "png", "webp")
+
+
+class SnapshotWriter:
+    # Encodes and writes frames on a small thread pool, so PNG/JPEG encoding
+    # never runs on the Tk thread. Names are timestamped and never reused. At
+    # most max_pending jobs wait at once; beyond that new ones are dropped
+    # rather than piling frames up in memory.
+    def __init__(self, directory="snapshots", fmt="jpg", quality=90, png_compression=3, workers=2, max_pending=8,
+                 on_error=None):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown snapshot format {fmt}, choose one of {', '.join(FORMATS)}")
+        self.directory = directory
+        self.fmt = fmt
+        if fmt == "jpg":
+            self.params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+        elif fmt == "webp":
+            self.params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+        else:
+            self.params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+        self.on_error = on_error
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="snapshot")
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.sequence = itertools.count()
+        self.dropped = 0
+
+    def unique_path(self, prefix, extension):
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+        return os.path.join(self.directory, f"{prefix}_{stamp}_{next(self.sequence)}.{extension}")
+
+    def _submit(self, work, *args):
+        if not self.slots.acquire(blocking=False):
+            self.dropped += 1
+            return False
+        future = self.pool.submit(work, *args)
+        future.add_done_callback(self._done)
+        return True
+
+    def _done(self, future):
+        self.slots.release()
+        error = future.exception()
+        if error is not None and self.on_error is not None:
+            self.on_error(error)
+
+    def save(self, frame, prefix="snapshot"):
+        # Returns the path the frame will be written to, or None if the queue is full
+        path = self.unique_path(prefix, self.fmt)
+        return path if self._submit(self._write_image, path, frame) else None
+
+    def save_clip(self, frames, fps, prefix="clip"):
+        path = self.unique_path(prefix, "mp4")
+        return path if self._submit(self._write_clip, path, frames, fps) else None
+
+    def _write_image(self, path, frame):
+        if not cv2.imwrite(path, frame, self.params):
+            raise IOError(f"Cannot write {path}")
+
+    def _write_clip(self, path, frames, fps):
+        height, width = frames[0].shape[:2]
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        if not writer.isOpened():
+            raise IOError(f"Cannot write {path}")
+        try:
+            for frame in frames:
+                # Capture resolution can change mid-clip (adaptive quality)
+                if frame.shape[:2] != (height, width):
+                    frame = cv2.resize(frame, (width, height))
+                writer.write(frame)
+        finally:
+            writer.release()
+
+    def close(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+
+class ClipRecorder:
+    # Keeps the last `pre` seconds of shown frames in memory (at most
+    # max_frames). When one of `classes` appears, the buffered frames plus the
+    # next `post` seconds are handed to the writer as one clip; another clip
+    # can start once `cooldown` seconds have passed since the last one ended.
+    def __init__(self, writer, classes, pre=3.0, post=3.0, cooldown=10.0, max_frames=150):
+        self.writer = writer
+        self.classes = set(classes)
+        self.pre = pre
+        self.post = post
+        self.cooldown = cooldown
+        self.ring = collections.deque(maxlen=max_frames)
+        self.clip = None
+        self.clip_end = 0.0
+        self.next_allowed = 0.0
+
+    def add(self, frame, timestamp, detections, names):
+        # Called for every shown frame; returns the clip path when one has just been queued
+        self.ring.append((timestamp, frame))
+        while self.ring and self.ring[0][0] < timestamp - self.pre:
+            self.ring.popleft()
+
+        if self.clip is not None:
+            self.clip.append((timestamp, frame))
+            if timestamp >= self.clip_end:
+                return self._finish(timestamp)
+            return None
+
+        if timestamp < self.next_allowed or detections is None or not len(detections):
+            return None
+        if any(names[cls] in self.classes for cls in set(detections.cls.tolist())):
+            self.clip = list(self.ring)
+            self.clip_end = timestamp + self.post
+        return None
+
+    def _finish(self, timestamp):
+        clip, self.clip = self.clip, None
+        self.next_allowed = timestamp + self.cooldown
+        duration = clip[-1][0] - clip[0][0]
+        # Shown frames arrive at whatever rate the pipeline reached, so the clip plays at that rate
+        fps = (len(clip) - 1) / duration if duration > 0 else 10.0
+        return self.writer.save_clip([frame for _, frame in clip], max(1.0, fps), prefix="event")
@@ -0,0 +1,38 @@
+import collections
+import hashlib
+
+import numpy as np
+
+
+def image_digest(image):
+    # Content hash of the pixels, computed once when a still is loaded
+    digest = hashlib.blake2b(np.ascontiguousarray(image).data, digest_size=16)
+    digest.update(repr((image.shape, str(image.dtype))).encode())
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    # LRU cache of still-image detections. Keys combine the image digest with
+    # everything that changes what the model returns (weights, backend, input
+    # size, tiling, ROI); threshold, class filter and label style are applied
+    # when drawing, so changing them never needs another forward pass.
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        detections = self.entries.get(key)
+        if detections is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return detections
+
+    def put(self, key, detections):
+        self.entries[key] = detections
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
@@ -0,0 +1,105 @@
+import time
+
+import numpy as np
+
+from detections import Detections
+
+
+def tile_origins(length, tile, overlap):
+    # Start offsets along one axis; the last tile is pushed back to end at the border
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1 - overlap)))
+    origins = list(range(0, length - tile, step))
+    origins.append(length - tile)
+    return origins
+
+
+def iter_tiles(image, tile, overlap):
+    # Yields views, not copies, so only the tiles of the current batch are ever copied
+    height, width = image.shape[:2]
+    for y in tile_origins(height, tile, overlap):
+        for x in tile_origins(width, tile, overlap):
+            yield x, y, image[y:y + tile, x:x + tile]
+
+
+def cut_at_border(boxes, x, y, tile_width, tile_height, width, height, margin=2):
+    # Boxes (tile coordinates) touching a tile edge that is not an image edge;
+    # the object probably continues in the neighbouring tile
+    return (((boxes[:, 0] <= margin) & (x > 0)) | ((boxes[:, 1] <= margin) & (y > 0))
+            | ((boxes[:, 2] >= tile_width - margin) & (x + tile_width < width))
+            | ((boxes[:, 3] >= tile_height - margin) & (y + tile_height < height)))
+
+
+def merge_overlapping(detections, sources, cut, threshold=0.5, iou_threshold=0.7):
+    # Greedy class-aware NMS over the whole image; returns the indices kept.
+    # sources says which pass each box comes from (-1 full image, else the
+    # tile number), cut which boxes were cut by a tile border. A cut box and a
+    # box from another pass are compared by the intersection over the smaller
+    # box, since the part of an object left in a tile sits inside the full
+    # box with a low IoU. All other pairs use plain IoU at the model's own
+    # NMS threshold, so neighbouring objects the model kept apart stay apart.
+    if len(detections) < 2:
+        return np.arange(len(detections))
+    boxes = detections.boxes
+    areas = np.maximum((boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1]), 1e-6)
+    order = np.argsort(-detections.conf, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        x1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        partial = (sources[rest] != sources[i]) & (cut[i] | cut[rest])
+        duplicate = np.where(partial, inter / np.minimum(areas[i], areas[rest]) > threshold,
+                             inter / (areas[i] + areas[rest] - inter) > iou_threshold)
+        same_class = detections.cls[rest] == detections.cls[i]
+        order = rest[~(same_class & duplicate)]
+    return np.array(keep, dtype=np.int64)
+
+
+def detect_tiled(model, image, tile=640, overlap=0.2, batch_size=4, threshold=0.5, full_pass=True):
+    # Runs the model on overlapping tile x tile crops so small objects keep
+    # their resolution. Tiles are copied batch by batch and the detections are
+    # merged after every batch, so memory stays bounded by one batch of tiles
+    # plus the surviving boxes regardless of the image size. The optional full
+    # pass catches objects larger than a tile. Returns the detections and the
+    # per-tile timings as (x, y, seconds).
+    height, width = image.shape[:2]
+    timings = []
+    merged = Detections.empty()
+    if full_pass:
+        merged = Detections.from_result(model(image, verbose=False)[0])
+    sources = np.full(len(merged), -1, dtype=np.int64)
+    cut = np.zeros(len(merged), dtype=bool)
+    number = 0
+
+    tiles = iter_tiles(image, tile, overlap)
+    while True:
+        batch = [next(tiles, None) for _ in range(batch_size)]
+        batch = [item for item in batch if item is not None]
+        if not batch:
+            break
+        start = time.perf_counter()
+        results = model([np.ascontiguousarray(view) for _, _, view in batch], verbose=False)
+        per_tile = (time.perf_counter() - start) / len(batch)
+
+        parts, part_sources, part_cut = [merged], [sources], [cut]
+        for (x, y, view), result in zip(batch, results):
+            detections = Detections.from_result(result)
+            if len(detections):
+                part_cut.append(cut_at_border(detections.boxes, x, y, view.shape[1], view.shape[0], width, height))
+                detections.boxes += np.array([x, y, x, y], dtype=np.float32)
+                parts.append(detections)
+                part_sources.append(np.full(len(detections), number, dtype=np.int64))
+            timings.append((x, y, per_tile))
+            number += 1
+        merged = Detections.concatenate(parts)
+        sources, cut = np.concatenate(part_sources), np.concatenate(part_cut)
+        keep = merge_overlapping(merged, sources, cut, threshold)
+        merged, sources, cut = merged.select(keep), sources[keep], cut[keep]
+    return merged, timings
@@ -0,0 +1,116 @@
+import numpy as np
+
+from detections import Detections
+
+
+def iou_matrix(a, b):
+    # Pairwise IoU of (N, 4) and (M, 4) xyxy boxes
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class Track:
+    __slots__ = ("id", "cls", "conf", "detected_conf", "box", "velocity", "detected_box", "since_detected", "misses")
+
+    def __init__(self, track_id, cls, conf, box):
+        self.id = track_id
+        self.cls = cls
+        self.conf = conf
+        self.detected_conf = conf
+        self.box = box.astype(np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.detected_box = self.box.copy()
+        self.since_detected = 0
+        self.misses = 0
+
+
+class IoUTracker:
+    # Keeps objects alive between detector runs. Tracks are matched to new
+    # detections greedily by IoU (same class only) and moved with a smoothed
+    # constant velocity on frames where the detector does not run. A track's
+    # confidence decays on every predicted frame; once a tracked object is down
+    # to min_ratio of the confidence it was last detected with,
+    # needs_detection() asks for a fresh detector pass. Relative, so weakly
+    # detected objects coast as long as strong ones; tracks the detector
+    # already missed are left to expire and never force a pass.
+    def __init__(self, iou_threshold=0.3, max_misses=10, min_ratio=0.3, decay=0.9):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_ratio = min_ratio
+        self.decay = decay
+        self.tracks = []
+        self.next_id = 1
+
+    def predict(self):
+        for track in self.tracks:
+            track.box += track.velocity
+            track.conf *= self.decay
+            track.since_detected += 1
+        return self.detections()
+
+    def needs_detection(self):
+        return any(not track.misses and track.conf < self.min_ratio * track.detected_conf for track in self.tracks)
+
+    def update(self, detections):
+        # Returns the detections that started a new track, i.e. what should be logged
+        matched_tracks, matched_dets = set(), set()
+        if self.tracks and len(detections):
+            predicted = np.stack([track.box + track.velocity for track in self.tracks])
+            iou = iou_matrix(predicted, detections.boxes)
+            track_cls = np.array([track.cls for track in self.tracks])
+            iou[track_cls[:, None] != detections.cls[None, :]] = 0
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                t, d = divmod(int(flat), len(detections))
+                if iou[t, d] < self.iou_threshold:
+                    break
+                if t in matched_tracks or d in matched_dets:
+                    continue
+                matched_tracks.add(t)
+                matched_dets.add(d)
+                self._correct(self.tracks[t], detections.boxes[d], float(detections.conf[d]))
+
+        survivors = []
+        for i, track in enumerate(self.tracks):
+            if i not in matched_tracks:
+                track.misses += 1
+                track.box += track.velocity
+                track.since_detected += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        self.tracks = survivors
+
+        new = [d for d in range(len(detections)) if d not in matched_dets]
+        for d in new:
+            self.tracks.append(Track(self.next_id, int(detections.cls[d]), float(detections.conf[d]), detections.boxes[d]))
+            self.next_id += 1
+        started = detections.select(np.array(new, dtype=np.int64))
+        started.ids = np.arange(self.next_id - len(new), self.next_id, dtype=np.int32)
+        return started
+
+    def _correct(self, track, box, conf):
+        frames = track.since_detected + 1
+        measured = (box - track.detected_box) / frames
+        track.velocity = 0.5 * track.velocity + 0.5 * measured
+        track.box = box.astype(np.float32)
+        track.detected_box = track.box.copy()
+        track.since_detected = 0
+        track.misses = 0
+        track.conf = conf
+        track.detected_conf = conf
+
+    def detections(self):
+        if not self.tracks:
+            return Detections.empty()
+        return Detections(
+            np.stack([track.box for track in self.tracks]).astype(np.float32),
+            np.array([track.conf for track in self.tracks], dtype=np.float32),
+            np.array([track.cls for track in self.tracks], dtype=np.int32),
+            np.array([track.id for track in self.tracks], dtype=np.int32),
+        )
@@ -0,0 +1,91 @@
+import csv
+import time
+
+import cv2
+
+
+class VideoFileSource:
+    # Recorded footage as a pipeline source. Only every stride-th frame is decoded,
+    # the others are skipped with grab(). Unless realtime is set, frames are
+    # returned as fast as the consumer takes them.
+    def __init__(self, path, stride=1, start=0.0, end=None, realtime=False):
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        if not self.capture.isOpened():
+            raise IOError(f"Cannot open video {path}")
+
+        self.stride = max(1, int(stride))
+        self.realtime = realtime
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self.position = int(start * self.fps)
+        if self.position:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, self.position)
+        self.end_position = int(end * self.fps) if end is not None else None
+        self.last_position = None
+        self.next_due = None
+
+    def read(self):
+        if self.end_position is not None and self.position >= self.end_position:
+            return False, None
+
+        ret, frame = self.capture.read()
+        if not ret:
+            return False, None
+        self.last_position = self.position
+        self.position += 1
+
+        for _ in range(self.stride - 1):
+            if not self.capture.grab():
+                break
+            self.position += 1
+
+        if self.realtime:
+            self._wait_for_frame_time()
+        return True, frame
+
+    def _wait_for_frame_time(self):
+        interval = self.stride / self.fps
+        now = time.perf_counter()
+        if self.next_due is None:
+            self.next_due = now
+        elif self.next_due > now:
+            time.sleep(self.next_due - now)
+        self.next_due = max(self.next_due, now) + interval
+
+    def release(self):
+        self.capture.release()
+
+
+class DetectionStreamWriter:
+    # Appends detections to a CSV as frames are processed, instead of keeping
+    # them in memory until an export. Called from the render worker.
+    def __init__(self, path, names, fps=None, flush_every=50):
+        self.path = path
+        self.names = names
+        self.fps = fps
+        self.flush_every = flush_every
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(["Frame", "Time", "Object", "Confidence", "X1", "Y1", "X2", "Y2"])
+        self.frames = 0
+        self.rows = 0
+
+    def write(self, packet):
+        self.frames += 1
+        # Frames the motion gate skipped only repeat the previous detections
+        if packet.reused:
+            return
+        seconds = packet.position / self.fps if self.fps else packet.timestamp
+        detections = packet.detections
+        self.writer.writerows(
+            [packet.position, f"{seconds:.3f}", self.names[cls], f"{conf:.4f}", *box]
+            for cls, conf, box in zip(detections.cls.tolist(), detections.conf.tolist(), detections.int_boxes().tolist())
+        )
+        self.rows += len(detections)
+        if self.frames % self.flush_every == 0:
+            self.file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()